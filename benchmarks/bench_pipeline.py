@@ -0,0 +1,219 @@
+"""Time each stage of the transmogrification pipeline on a synthetic fleet.
+
+The fleet is built by cycling through the inspector samples used by the unit
+tests, giving every node its own UUID and name. Results are printed (or
+written) as JSON so they can be compared across releases.
+
+    python benchmarks/bench_pipeline.py --nodes 200 --output bench.json
+"""
+
+import argparse
+import json
+import pathlib
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import pydantic
+from git import Repo
+
+from reference_transmogrifier import reference_api
+from reference_transmogrifier.models import blazar, inspector, reference_repo
+
+SAMPLES_DIR = pathlib.Path(__file__).parent.parent.joinpath("tests/unit/json_samples")
+
+# payloads that go through the whole pipeline
+CONVERSION_SAMPLES = [
+    "ironic_inspector_nc35.json",
+    "inspector/gigaio01.json",
+]
+# only used for PCI lookups, since it has no extra hardware data
+PCI_ONLY_SAMPLES = [
+    "inspector/p3-cpu-042.json",
+]
+BLAZAR_SAMPLE = "blazar_nc35.json"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=100, help="Size of the fleet")
+    parser.add_argument("--output", help="Write results to this file, not stdout")
+    return parser.parse_args()
+
+
+def synthesize_fleet(count):
+    """Return (inspection bytes, blazar host dict) pairs for a fleet of nodes."""
+    with open(SAMPLES_DIR.joinpath(BLAZAR_SAMPLE)) as f:
+        blazar_template = json.load(f)
+
+    payloads = []
+    for name in CONVERSION_SAMPLES:
+        with open(SAMPLES_DIR.joinpath(name), "rb") as f:
+            payloads.append(f.read())
+
+    fleet = []
+    for i in range(count):
+        blazar_host = dict(
+            blazar_template,
+            hypervisor_hostname=str(uuid.UUID(int=i + 1, version=4)),
+            node_name=f"bench{i:04d}",
+        )
+        fleet.append((payloads[i % len(payloads)], blazar_host))
+    return fleet
+
+
+def pci_devices(count):
+    devices = []
+    for name in CONVERSION_SAMPLES + PCI_ONLY_SAMPLES:
+        with open(SAMPLES_DIR.joinpath(name)) as f:
+            devices.append(json.load(f)["pci_devices"])
+    return [devices[i % len(devices)] for i in range(count)]
+
+
+class Timer(object):
+    def __init__(self) -> None:
+        self.stages = {}
+
+    def run(self, stage, func, items):
+        """Call func on each item, recording the stage's timings."""
+        results = []
+        start = time.perf_counter()
+        for item in items:
+            results.append(func(item))
+        elapsed = time.perf_counter() - start
+
+        self.stages[stage] = {
+            "count": len(items),
+            "total_seconds": round(elapsed, 6),
+            "per_item_ms": round(elapsed * 1000 / max(len(items), 1), 4),
+        }
+        return results
+
+
+def peak_conversion_memory(fleet, model):
+    """Peak traced memory of validating the fleet with ``model`` and converting it.
+
+    Kept separate from the timed stages, since tracing slows them down a lot.
+    """
+    tracemalloc.start()
+    nodes = []
+    for inspection_raw, blazar_host in fleet:
+        idata = model.model_validate_json(inspection_raw)
+        nodes.append(
+            reference_repo.Node.from_inspector_result(blazar.Host(**blazar_host), idata)
+        )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    args = parse_args()
+    timer = Timer()
+    fleet = synthesize_fleet(args.nodes)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = pathlib.Path(tmp_dir)
+        pci_ids_file = inspector.pci.PCI_MAP.pci_ids_file
+        cache_dir = tmp_path.joinpath("cache")
+
+        timer.run(
+            "pci_index_build", inspector.pci.PciIdsMap._build_index, [pci_ids_file]
+        )
+        # the first load writes the index cache, the second one reads it
+        inspector.pci.PciIdsMap(cache_dir=cache_dir).index
+        timer.run(
+            "pci_index_load_cached",
+            lambda _: inspector.pci.PciIdsMap(cache_dir=cache_dir).index,
+            [None],
+        )
+
+        pci_map = inspector.pci.PciIdsMap(cache_dir=cache_dir)
+
+        def lookup_names(devices):
+            for d in devices:
+                try:
+                    pci_map.lookup_vendor(d["vendor_id"])
+                    pci_map.lookup_product(d["vendor_id"], d["product_id"])
+                except KeyError:
+                    pass
+
+        timer.run("pci_lookups", lookup_names, pci_devices(args.nodes))
+
+        timer.run(
+            "validate_inspector_result",
+            lambda n: inspector.InspectorResult.model_validate_json(n[0]),
+            fleet,
+        )
+        conversion_inputs = timer.run(
+            "validate_conversion_inspector_result",
+            lambda n: (
+                inspector.ConversionInspectorResult.model_validate_json(n[0]),
+                blazar.Host(**n[1]),
+            ),
+            fleet,
+        )
+        nodes = timer.run(
+            "from_inspector_result",
+            lambda n: reference_repo.Node.from_inspector_result(n[1], n[0]),
+            conversion_inputs,
+        )
+        timer.run(
+            "model_dump_json",
+            lambda n: n.model_dump_json(
+                exclude_none=True, exclude_unset=True, indent=2
+            ),
+            nodes,
+        )
+
+        repo_dir = tmp_path.joinpath("reference-repository")
+        repo = Repo.init(repo_dir)
+        reference_api.get_node_data_dir(repo_dir, "uc").mkdir(parents=True)
+        timer.run(
+            "write_reference_repo",
+            lambda n: reference_api.write_reference_repo(repo_dir, "uc", n),
+            nodes,
+        )
+        timer.run(
+            "write_reference_repo_unchanged",
+            lambda n: reference_api.write_reference_repo(repo_dir, "uc", n),
+            nodes,
+        )
+        timer.run(
+            "diff_reference_repo",
+            lambda _: reference_api.diff_reference_repo(repo, "uc"),
+            [None],
+        )
+
+    results = {
+        "nodes": args.nodes,
+        "python": platform.python_version(),
+        "pydantic": pydantic.VERSION,
+        "stages": timer.stages,
+        # the full inspector models, and the slim views conversion uses
+        "peak_conversion_memory_bytes": {
+            "inspector_result": peak_conversion_memory(
+                fleet, inspector.InspectorResult
+            ),
+            "conversion_inspector_result": peak_conversion_memory(
+                fleet, inspector.ConversionInspectorResult
+            ),
+        },
+        # kilobytes on Linux, bytes on macOS
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import gzip
+import json
+import os
+import pathlib
+import time
+from typing import Dict, List, Optional
+
+# bumped whenever the record layout changes
+ARCHIVE_FORMAT = 1
+
+
+class CaptureWriter(object):
+    """Write a site's raw inputs to a single gzip-compressed JSON-lines file.
+
+    The first record is a header acting as the archive's index: the format
+    version, region name and the IDs of every node and Blazar host it holds.
+    It is followed by one record per node, per Blazar host and per
+    inspection payload:
+
+        {"type": "header", "format": 1, "region_name": ..., "nodes": [...], ...}
+        {"type": "node", "node": {"id": ..., "name": ..., "updated_at": ...}}
+        {"type": "blazar_host", "host": {...}}
+        {"type": "introspection", "node_id": ..., "data": "<raw JSON text>"}
+
+    Inspection payloads are stored as strings, so replaying them gives back
+    exactly the bytes the API returned. The archive is written next to its
+    final path and only renamed into place by close().
+    """
+
+    def __init__(
+        self, path, region_name: str, nodes: List[dict], blazar_hosts: Dict[str, dict]
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+
+        self._write(
+            {
+                "type": "header",
+                "format": ARCHIVE_FORMAT,
+                "created_at": time.time(),
+                "region_name": region_name,
+                "nodes": [n["id"] for n in nodes],
+                "blazar_hosts": sorted(blazar_hosts),
+            }
+        )
+        for node in nodes:
+            self._write({"type": "node", "node": node})
+        for _, host in sorted(blazar_hosts.items()):
+            self._write({"type": "blazar_host", "host": host})
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, default=str))
+        self._file.write("\n")
+
+    def put_introspection(self, node_id: str, data: bytes) -> None:
+        self._write(
+            {"type": "introspection", "node_id": node_id, "data": data.decode("utf-8")}
+        )
+
+    def close(self) -> None:
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+
+class CaptureArchive(object):
+    """Read an archive written by CaptureWriter.
+
+    Provides the same getters as IronicDataCache, so a run can be replayed
+    from either. The whole archive is read up front.
+    """
+
+    def __init__(self, path) -> None:
+        self.path = pathlib.Path(path)
+        self.nodes = []
+        self.blazar_hosts = {}
+        self.introspection = {}
+
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            self.header = json.loads(f.readline())
+            if self.header.get("format") != ARCHIVE_FORMAT:
+                raise ValueError(
+                    f"{self.path}: unsupported capture format "
+                    f"{self.header.get('format')}, expected {ARCHIVE_FORMAT}"
+                )
+            for line in f:
+                record = json.loads(line)
+                if record["type"] == "node":
+                    self.nodes.append(record["node"])
+                elif record["type"] == "blazar_host":
+                    host = record["host"]
+                    self.blazar_hosts[host["hypervisor_hostname"]] = host
+                elif record["type"] == "introspection":
+                    self.introspection[record["node_id"]] = record["data"]
+
+    def get_region_name(self) -> Optional[str]:
+        return self.header.get("region_name")
+
+    def get_nodes(self) -> List[dict]:
+        return list(self.nodes)
+
+    def get_blazar_hosts(self) -> Dict[str, dict]:
+        return dict(self.blazar_hosts)
+
+    def get_introspection(self, node_id: str) -> Optional[dict]:
+        data = self.introspection.get(node_id)
+        if data is None:
+            return None
+        return {"data": data.encode("utf-8")}
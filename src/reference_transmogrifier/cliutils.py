@@ -0,0 +1,12 @@
+import argparse
+
+
+def positive_int(value) -> int:
+    """argparse type for counts of workers or processes."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value!r}")
+    return number
@@ -0,0 +1,31 @@
+import os
+import pathlib
+import tempfile
+from typing import Optional
+
+
+def atomic_write(path, data: bytes, mode: Optional[int] = None) -> None:
+    """Replace the file at ``path`` with ``data`` in one step.
+
+    The data goes to a temp file in the same directory, which is renamed
+    over ``path``, so readers never see a partial file. If anything fails
+    the temp file is removed, so nothing is left behind, e.g. in a git
+    checkout that is about to be committed. ``mode`` sets the permissions;
+    otherwise the file is only readable by its owner.
+    """
+    path = pathlib.Path(path)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import pathlib
+from importlib.resources import files
+from typing import Optional
+
+from reference_transmogrifier.fileutils import atomic_write
+from reference_transmogrifier.models import vocabulary
+
+
+def converter_fingerprint() -> str:
+    """Hash of the model code and data that determine the conversion output.
+
+    Folded into every input hash, so changing a validator (or pci.ids, or the
+    vocabulary override file) invalidates all previously recorded nodes.
+    """
+    models = files("reference_transmogrifier.models")
+    digest = hashlib.sha256()
+    paths = sorted(
+        p
+        for p in pathlib.Path(str(models)).rglob("*")
+        if p.suffix in (".py", ".ids", ".json")
+    )
+    override = vocabulary.override_file()
+    if override:
+        paths.append(pathlib.Path(override))
+    for path in paths:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def file_hash(path) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class IncrementalState(object):
+    """Record of each node's input hash and the output it produced.
+
+    A node can be skipped when its inputs hash the same as last time and the
+    output file in the checkout still has the contents that run produced.
+    """
+
+    def __init__(self, state_file) -> None:
+        self.state_file = pathlib.Path(state_file)
+        self.fingerprint = converter_fingerprint()
+        try:
+            with open(self.state_file, "r") as f:
+                self.nodes = json.load(f)
+        except FileNotFoundError:
+            self.nodes = {}
+
+    def input_hash(self, inspection_raw: bytes, blazar_host_dict: dict) -> str:
+        digest = hashlib.sha256(self.fingerprint.encode())
+        digest.update(inspection_raw)
+        blazar_json = json.dumps(blazar_host_dict, sort_keys=True, default=str)
+        digest.update(blazar_json.encode())
+        return digest.hexdigest()
+
+    def is_current(self, node_id: str, input_hash: str, output_path) -> bool:
+        recorded = self.nodes.get(node_id)
+        if not recorded or recorded["input"] != input_hash:
+            return False
+        return recorded["output"] == file_hash(output_path)
+
+    def record(self, node_id: str, input_hash: str, output_path) -> None:
+        self.nodes[node_id] = {
+            "input": input_hash,
+            "output": file_hash(output_path),
+        }
+
+    def save(self) -> None:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(self.nodes, indent=2, sort_keys=True)
+        atomic_write(self.state_file, data.encode("utf-8"))
@@ -0,0 +1,96 @@
+import json
+import pathlib
+from typing import Dict, List, Optional
+
+from reference_transmogrifier.fileutils import atomic_write
+
+
+class IronicDataCache(object):
+    """On-disk cache of the raw inputs fetched from Ironic and Blazar.
+
+    Everything is stored as plain JSON, one file per node:
+
+        <cache_dir>/metadata.json                  region name of the site
+        <cache_dir>/nodes/<uuid>.json              id, name and updated_at
+        <cache_dir>/blazar_hosts/<uuid>.json       flattened Blazar host
+        <cache_dir>/introspection/<uuid>.json      processed inspection data
+        <cache_dir>/introspection/<uuid>.meta.json
+
+    Inspection data is kept as the raw bytes the API returned. Its meta file
+    records the node's ``updated_at`` and the introspection ``finished_at``
+    it was fetched for, which is what callers use to decide whether an entry
+    is still current.
+    """
+
+    def __init__(self, cache_dir) -> None:
+        self.cache_dir = pathlib.Path(cache_dir)
+
+    def _path(self, kind: str, name: str) -> pathlib.Path:
+        return self.cache_dir.joinpath(kind, f"{name}.json")
+
+    def _read(self, path: pathlib.Path) -> Optional[dict]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_bytes(self, path: pathlib.Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, data)
+
+    def _write(self, path: pathlib.Path, data) -> None:
+        self._write_bytes(path, json.dumps(data).encode("utf-8"))
+
+    def _read_all(self, kind: str) -> List[dict]:
+        kind_dir = self.cache_dir.joinpath(kind)
+        if not kind_dir.is_dir():
+            return []
+        return [self._read(p) for p in sorted(kind_dir.glob("*.json"))]
+
+    def get_region_name(self) -> Optional[str]:
+        metadata = self._read(self.cache_dir.joinpath("metadata.json")) or {}
+        return metadata.get("region_name")
+
+    def put_region_name(self, region_name: str) -> None:
+        self._write(
+            self.cache_dir.joinpath("metadata.json"), {"region_name": region_name}
+        )
+
+    def get_nodes(self) -> List[dict]:
+        return self._read_all("nodes")
+
+    def put_node(self, node: dict) -> None:
+        self._write(self._path("nodes", node["id"]), node)
+
+    def get_blazar_hosts(self) -> Dict[str, dict]:
+        return {h["hypervisor_hostname"]: h for h in self._read_all("blazar_hosts")}
+
+    def put_blazar_host(self, host: dict) -> None:
+        self._write(self._path("blazar_hosts", host["hypervisor_hostname"]), host)
+
+    def get_introspection(self, node_id: str) -> Optional[dict]:
+        """Cached entry with raw ``data``, ``finished_at`` and ``node_updated_at``."""
+        meta = self._read(self._path("introspection", f"{node_id}.meta"))
+        if meta is None:
+            return None
+        try:
+            with open(self._path("introspection", node_id), "rb") as f:
+                return dict(meta, data=f.read())
+        except FileNotFoundError:
+            return None
+
+    def put_introspection(
+        self, node_id: str, data: bytes, finished_at: str, node_updated_at: str
+    ) -> None:
+        # the meta file marks the entry complete, so write it last
+        self._write_bytes(self._path("introspection", node_id), data)
+        self.update_introspection(node_id, finished_at, node_updated_at)
+
+    def update_introspection(
+        self, node_id: str, finished_at: str, node_updated_at: str
+    ) -> None:
+        self._write(
+            self._path("introspection", f"{node_id}.meta"),
+            {"finished_at": finished_at, "node_updated_at": node_updated_at},
+        )
@@ -1,28 +1,47 @@
 import argparse
+import contextlib
+import functools
+import itertools
 import json
 import os
 import pathlib
 import re
 import shutil
+import time
 import uuid
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from tempfile import TemporaryDirectory
+from typing import Callable, Dict, List, NamedTuple
 from urllib.parse import urlparse
 
 import openstack
-from git import Repo
+from git import InvalidGitRepositoryError, NoSuchPathError, Repo
 from github import Github
-from openstack.exceptions import BadRequestException, NotFoundException
-from pydantic import ValidationError
+from openstack.exceptions import (
+    BadRequestException,
+    NotFoundException,
+    raise_from_response,
+)
 
-from reference_transmogrifier import reference_api
+from reference_transmogrifier import (
+    capture,
+    incremental,
+    ironic_cache,
+    metrics,
+    profiling,
+    reference_api,
+)
+from reference_transmogrifier.cliutils import positive_int
 from reference_transmogrifier.models import blazar, inspector, reference_repo
 
 
 def commit_and_pr_changes(
         reference_repo_url,
         reference_repo_ref,
-        output_dir
+        output_dir,
+        sites=None,
     ):
     github_token = os.environ.get("GITHUB_TOKEN")
     if not github_token:
@@ -40,6 +59,8 @@ def commit_and_pr_changes(
     branch_name = f"auto-update-{now}"
     pr_title = f"Automated update of reference data ({now})"
     pr_body = f"This is an automated update of the reference data on {now}"
+    if sites:
+        pr_body += f" for sites: {', '.join(sites)}"
 
     repo = Repo(str(output_dir))
     repo.git.remote('set-url', 'origin', repo_url)
@@ -60,10 +81,274 @@ def commit_and_pr_changes(
     print(f"created PR: {pr.html_url}")
 
 
+def clone_reference_repo(url, ref, to_path, sparse_paths=None):
+    """Clone the reference repository.
+
+    With ``sparse_paths``, make a depth 1, blobless clone with only those
+    paths checked out.
+    """
+    if not sparse_paths:
+        return Repo.clone_from(url=url, branch=ref, to_path=to_path)
+
+    repo = Repo.clone_from(
+        url=url,
+        branch=ref,
+        to_path=to_path,
+        depth=1,
+        filter="blob:none",
+        sparse=True,
+    )
+    repo.git.sparse_checkout("set", *sparse_paths)
+    return repo
+
+
+def update_reference_repo(repo_dir, url, ref, paths):
+    """Reset an existing clone to the latest ``ref`` from ``url``.
+
+    Untracked files under ``paths`` (e.g. nodes written by a previous run)
+    are removed, so the checkout matches upstream before conversion. The
+    clone's depth and sparse-checkout settings are left as they are.
+    """
+    repo = Repo(repo_dir)
+    repo.git.fetch(url, ref)
+    repo.git.reset("--hard", "FETCH_HEAD")
+    repo.git.clean("-fd", "--", *paths)
+    return repo
+
+
+def open_local_repo(repo_dir, paths):
+    """Use a local checkout as-is, without fetching from any remote.
+
+    If there is no repository at ``repo_dir`` yet, an empty one is created,
+    so replayed nodes all show up as added.
+    """
+    try:
+        repo = Repo(repo_dir)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        print(f"initializing empty reference repository in {repo_dir}")
+        repo = Repo.init(repo_dir, mkdir=True)
+    for path in paths:
+        pathlib.Path(repo.working_dir).joinpath(path).mkdir(
+            parents=True, exist_ok=True
+        )
+    return repo
+
+
+# the only Ironic node fields read by node_summary()
+NODE_FIELDS = ["uuid", "name", "updated_at"]
+
+
+def node_summary(node) -> dict:
+    """The subset of an Ironic node we use, in a form that can be cached."""
+    return {"id": node.id, "name": node.name, "updated_at": node.updated_at}
+
+
+def blazar_host_to_dict(host) -> dict:
+    # HACK: convert back to the form the API returns, instead of using properties field
+    host_dict = host.to_dict()
+    host_properties = host_dict.pop("properties")
+    host_dict.update(host_properties)
+    return host_dict
+
+
+def load_inventory(
+    conn, only_nodes=None, except_nodes=None, workers=1, skip_missing=False
+):
+    """Fetch the Ironic nodes to process and the Blazar hosts for them.
+
+    A short --only-nodes list is fetched node by node, concurrently; otherwise
+    all nodes are listed, asking Ironic for only the fields we use. Blazar
+    can't look hosts up by Ironic UUID, so its host list is still needed, but
+    it is fetched alongside the Ironic requests and only the selected nodes'
+    hosts are converted.
+
+    With ``skip_missing``, --only-nodes entries this cloud doesn't have are
+    left out instead of raising NotFoundException, for runs over several
+    sites where each node only exists at one of them.
+    """
+
+    def get_node(name_or_id):
+        try:
+            return conn.baremetal.get_node(name_or_id, fields=NODE_FIELDS)
+        except NotFoundException:
+            if skip_missing:
+                return None
+            raise
+
+    with ThreadPoolExecutor(max_workers=max(workers, 2)) as executor:
+        hosts_future = executor.submit(lambda: list(conn.reservation.hosts()))
+        if only_nodes:
+            # assume we have a short list to target, get them individually
+            nodes = [n for n in executor.map(get_node, only_nodes) if n]
+        else:
+            nodes = list(conn.baremetal.nodes(fields=NODE_FIELDS))
+        hosts = hosts_future.result()
+
+    node_summaries = select_nodes(
+        [node_summary(n) for n in nodes], except_nodes=except_nodes
+    )
+    node_ids = {n["id"] for n in node_summaries}
+    blazar_hosts = {
+        h.hypervisor_hostname: blazar_host_to_dict(h)
+        for h in hosts
+        if h.hypervisor_hostname in node_ids
+    }
+    return node_summaries, blazar_hosts
+
+
+def select_nodes(nodes, only_nodes=None, except_nodes=None):
+    """Filter node summaries by name or ID."""
+    if only_nodes:
+        return [n for n in nodes if n["name"] in only_nodes or n["id"] in only_nodes]
+    if except_nodes:
+        return [
+            n
+            for n in nodes
+            if (n["name"] not in except_nodes) and (n["id"] not in except_nodes)
+        ]
+    return list(nodes)
+
+
+def fetch_inspection_data(conn, node, cache=None):
+    """Get raw processed inspection data for a node, or None if it has none.
+
+    The payload is kept as the JSON bytes from the API, so it can be cached,
+    hashed and sent to worker processes without being parsed, and is only
+    decoded once, by pydantic, during conversion.
+
+    With a cache, a stored payload is reused as long as the node has not been
+    updated since, or its introspection has not finished again since.
+    """
+    cached = cache.get_introspection(node["id"]) if cache else None
+    if cached and cached["node_updated_at"] == node["updated_at"]:
+        return cached["data"]
+
+    try:
+        finished_at = None
+        if cache:
+            introspection = conn.baremetal_introspection.get_introspection(node["id"])
+            finished_at = introspection.finished_at
+            if cached and cached["finished_at"] == finished_at:
+                cache.update_introspection(node["id"], finished_at, node["updated_at"])
+                return cached["data"]
+
+        # same request as get_introspection_data(processed=True), minus the
+        # response.json() we would only have to serialize again
+        response = conn.baremetal_introspection.get(
+            f"introspection/{node['id']}/data"
+        )
+        raise_from_response(response)
+        inspection_raw = response.content
+    except (BadRequestException, NotFoundException):
+        return None
+
+    if cache:
+        cache.put_introspection(
+            node["id"], inspection_raw, finished_at, node["updated_at"]
+        )
+    return inspection_raw
+
+
+def load_cached_inspection_data(cache, node):
+    cached = cache.get_introspection(node["id"])
+    return cached["data"] if cached else None
+
+
+def format_payload(inspection_raw: bytes) -> str:
+    """Pretty print a payload for --verbose, or show it as is if not JSON."""
+    try:
+        return json.dumps(json.loads(inspection_raw), indent=2)
+    except ValueError:
+        return inspection_raw.decode("utf-8", errors="replace")
+
+
+def timed_call(func, *args):
+    """Call func, returning its result and how long it took."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def convert_node(inspection_raw, blazar_host_dict):
+    """Validate the raw inputs for one node and build its reference data.
+
+    Returns a ``(node, error, timings)`` tuple rather than raising, so that it
+    can run in a process pool without having to pickle validation errors.
+    ``timings`` holds the seconds spent in the validate and convert stages.
+    """
+    timings = {}
+    if blazar_host_dict is None:
+        return None, "no Blazar host found for the node", timings
+
+    try:
+        start = time.perf_counter()
+        i_data = inspector.ConversionInspectorResult.model_validate_json(
+            inspection_raw
+        )
+        b_data = blazar.Host(**blazar_host_dict)
+        timings["validate"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        node = reference_repo.Node.from_inspector_result(b_data, i_data)
+        timings["convert"] = time.perf_counter() - start
+        return node, None, timings
+    except ValueError as ex:
+        # ValidationError, or inputs that can't be reconciled, like disks
+        # that don't match up between inventory and extra hardware data
+        return None, repr(ex), timings
+
+
+def start_convert_pool(processes):
+    """Process pool for convert_node, with its workers already running.
+
+    With the fork start method, workers are only forked when the first task
+    is submitted. Submitting one here, before any fetch threads exist, means
+    they aren't forked while other threads hold locks, and they inherit the
+    PCI index built just before. With one process, conversion runs inline
+    and the context manager yields None.
+    """
+    if processes <= 1:
+        return contextlib.nullcontext()
+
+    inspector.pci.PCI_MAP.index
+    executor = ProcessPoolExecutor(max_workers=processes)
+    executor.submit(int).result()
+    return executor
+
+
+def convert_in_order(executor, items, window=1, convert=convert_node):
+    """Run convert over (context, args) items, yielding (context, result).
+
+    Up to ``window`` items are converted ahead in the executor, but results
+    are yielded in input order. Without an executor, items are converted
+    inline as they are consumed.
+    """
+    if executor is None:
+        for context, convert_args in items:
+            yield context, convert(*convert_args)
+        return
+
+    pending = deque()
+    for context, convert_args in items:
+        pending.append((context, executor.submit(convert, *convert_args)))
+        if len(pending) >= window:
+            context, future = pending.popleft()
+            yield context, future.result()
+
+    while pending:
+        context, future = pending.popleft()
+        yield context, future.result()
+
+
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--verbose", action="store_true")
-    parser.add_argument("--cloud")
+    parser.add_argument(
+        "--cloud",
+        nargs="+",
+        help="One or more clouds from clouds.yaml. Several clouds are fetched "
+        "concurrently and written to the same checkout, giving a single PR",
+    )
     parser.add_argument(
         "--push-changes",
         action="store_true",
@@ -79,7 +364,46 @@ def parse_args():
         help="git ref to compare with (sha, branch, tag, whatever)",
         default="master",
     )
-    parser.add_argument("--ironic-data-cache-dir")
+    parser.add_argument(
+        "--reference-repo-dir",
+        help="Reuse an existing clone at this path, fetching --reference-repo-ref "
+        "from --reference-repo-url and resetting to it instead of making a fresh "
+        "clone",
+    )
+    parser.add_argument(
+        "--shallow-clone",
+        action="store_true",
+        help="Only fetch the latest commit, and only check out the site's node "
+        "data. Only applies to fresh clones, not --reference-repo-dir",
+    )
+    parser.add_argument(
+        "--ironic-data-cache-dir",
+        help="Cache fetched Ironic, Inspector and Blazar data in this directory",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use data from --ironic-data-cache-dir, without contacting the cloud",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="PATH",
+        help="Save the fetched nodes, Blazar hosts and inspection data to a "
+        "gzip-compressed archive at PATH, for use with --replay",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="Convert inputs from a --capture archive, or a directory laid out "
+        "like --ironic-data-cache-dir, into the local checkout at "
+        "--reference-repo-dir, without contacting the cloud or the git remote",
+    )
+    parser.add_argument(
+        "--site",
+        choices=sorted(set(reference_api.REGION_NAME_MAP.values())),
+        help="Site to write nodes for, instead of the one mapped from the "
+        "region name",
+    )
     parser.add_argument(
         "--only-nodes",
         nargs="+",
@@ -90,96 +414,326 @@ def parse_args():
         nargs="+",
         help="Name or ID of one or more nodes to exclude from the list. Mutually exclusive with --only-node. Example: `--except-nodes nc01 nc60`",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Number of concurrent requests used to fetch inspection data",
+    )
+    parser.add_argument(
+        "--processes",
+        type=positive_int,
+        default=1,
+        help="Number of processes used to validate and convert nodes",
+    )
+    parser.add_argument(
+        "--incremental-state",
+        help="JSON file recording node input hashes; nodes whose inputs are "
+        "unchanged since the last run are skipped",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write run timings and counters to this file, in Prometheus "
+        "textfile format if it ends in .prom and JSON otherwise",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="STATS_FILE",
+        help="Profile the run with cProfile, writing stats to this file and "
+        "printing the most expensive functions. Conversion runs in-process.",
+    )
+    parser.add_argument(
+        "--profile-scope",
+        choices=["run", "conversion"],
+        default="run",
+        help="Profile the whole run, including fetch threads, or only node "
+        "validation and conversion",
+    )
+    args = parser.parse_args()
+    if args.offline and not args.ironic_data_cache_dir:
+        parser.error("--offline requires --ironic-data-cache-dir")
+    if args.replay and not args.reference_repo_dir:
+        parser.error("--replay requires --reference-repo-dir")
+    if args.replay and args.push_changes:
+        parser.error("--replay can't be combined with --push-changes")
+    if args.replay and args.capture:
+        parser.error("--replay can't be combined with --capture")
+    if args.cloud and len(args.cloud) > 1:
+        for option in ("capture", "offline", "replay", "site"):
+            if getattr(args, option):
+                parser.error(f"--{option} only supports a single --cloud")
+    return args
 
 
 def main():
     args = parse_args()
+    if not args.profile:
+        return run(args)
 
-    conn = openstack.connect(cloud=args.cloud)
+    if args.processes > 1:
+        print("--profile converts nodes in-process, ignoring --processes")
+        args.processes = 1
 
-    region_name = conn.config.get_region_name()
-    cloud_name = reference_api.REGION_NAME_MAP[region_name]
+    profiler = profiling.Profiler(args.profile)
+    try:
+        if args.profile_scope == "conversion":
+            run(args, convert=profiler.wrap(convert_node))
+        else:
+            profiler.enable()
+            run(args)
+    finally:
+        profiler.disable()
+        profiler.report()
 
-    base_dir = pathlib.Path("./output")
-    base_dir.mkdir(exist_ok=True)
 
-    final_output_dir = base_dir.joinpath("reference-repository")
-    print(f"final output dir will be {final_output_dir}")
-    if final_output_dir.exists():
-        unique_id = uuid.uuid4().hex[0:8]
-        archive_dir = base_dir.joinpath(f"reference-repository-{unique_id}")
-        print(f"moving existing output dir to {archive_dir}")
-        shutil.move(str(final_output_dir), str(archive_dir))
+class SiteInputs(NamedTuple):
+    cloud_name: str
+    region_name: str
+    nodes: List[dict]
+    blazar_hosts: Dict[str, dict]
+    # called with a node summary, returns its raw inspection data or None
+    fetch: Callable
+
+
+def load_site(args, cloud=None) -> SiteInputs:
+    """Load a site's nodes and Blazar hosts, live or from cached/captured data."""
+    cache = None
+    if args.replay and os.path.isfile(args.replay):
+        cache = capture.CaptureArchive(args.replay)
+    elif args.replay:
+        cache = ironic_cache.IronicDataCache(args.replay)
+    elif args.ironic_data_cache_dir:
+        cache_dir = args.ironic_data_cache_dir
+        if args.cloud and len(args.cloud) > 1:
+            # one cache per site, since each records its own region
+            cache_dir = os.path.join(cache_dir, cloud)
+        cache = ironic_cache.IronicDataCache(cache_dir)
+
+    if args.offline or args.replay:
+        region_name = cache.get_region_name()
+        nodes_to_process = select_nodes(
+            cache.get_nodes(), args.only_nodes, args.except_nodes
+        )
+        ironic_uuid_to_blazar_hosts = cache.get_blazar_hosts()
+        fetch = functools.partial(load_cached_inspection_data, cache)
+    else:
+        conn = openstack.connect(cloud=cloud)
+        region_name = conn.config.get_region_name()
+
+        nodes_to_process, ironic_uuid_to_blazar_hosts = load_inventory(
+            conn,
+            args.only_nodes,
+            args.except_nodes,
+            workers=args.workers,
+            skip_missing=len(args.cloud or []) > 1,
+        )
+
+        if cache:
+            cache.put_region_name(region_name)
+            for node in nodes_to_process:
+                cache.put_node(node)
+            for host in ironic_uuid_to_blazar_hosts.values():
+                cache.put_blazar_host(host)
 
-    local_dir = TemporaryDirectory(dir=base_dir)
-    reference_repo_checkout = Repo.clone_from(
-        url=args.reference_repo_url,
-        branch=args.reference_repo_ref,
-        to_path=local_dir.name,
+        fetch = functools.partial(fetch_inspection_data, conn, cache=cache)
+
+    return SiteInputs(
+        cloud_name=args.site or reference_api.REGION_NAME_MAP[region_name],
+        region_name=region_name,
+        nodes=nodes_to_process,
+        blazar_hosts=ironic_uuid_to_blazar_hosts,
+        fetch=fetch,
     )
 
-    ironic_uuid_to_blazar_hosts = {
-        h.hypervisor_hostname: h for h in conn.reservation.hosts()
-    }
 
-    if args.only_nodes:
-        # assume we have a short list to target, get them individually
-        nodes_to_process = [conn.baremetal.get_node(n) for n in args.only_nodes]
-    elif args.except_nodes:
-        # get list of all nodes, filter out a subset
-        nodes_to_process = [
-            n
-            for n in conn.baremetal.nodes()
-            if (n.name not in args.except_nodes) and (n.id not in args.except_nodes)
-        ]
+def interleave(*iterables):
+    """Round-robin over the iterables, e.g. to spread requests across sites."""
+    missing = object()
+    for items in itertools.zip_longest(*iterables, fillvalue=missing):
+        yield from (item for item in items if item is not missing)
+
+
+def run(args, convert=convert_node):
+    clouds = args.cloud or [None]
+    with ThreadPoolExecutor(max_workers=len(clouds)) as executor:
+        sites = list(executor.map(functools.partial(load_site, args), clouds))
+
+    cloud_names = [site.cloud_name for site in sites]
+    if len(set(cloud_names)) != len(cloud_names):
+        raise SystemExit(f"--cloud maps more than one cloud to the same site: {clouds}")
+
+    if args.only_nodes and len(sites) > 1:
+        # each cloud skipped the nodes it doesn't have, so check they all
+        # turned up somewhere
+        found = set()
+        for site in sites:
+            found.update(key for n in site.nodes for key in (n["id"], n["name"]))
+        not_found = [name for name in args.only_nodes if name not in found]
+        if not_found:
+            raise SystemExit(f"--only-nodes not found at any site: {not_found}")
+
+    capture_writer = None
+    if args.capture:
+        capture_writer = capture.CaptureWriter(
+            args.capture, sites[0].region_name, sites[0].nodes, sites[0].blazar_hosts
+        )
+
+    nodes_subdirs = [
+        reference_api.get_node_data_dir("", name).as_posix() for name in cloud_names
+    ]
+    sparse_paths = nodes_subdirs if args.shallow_clone else None
+
+    if args.replay:
+        final_output_dir = pathlib.Path(args.reference_repo_dir)
+        reference_repo_checkout = open_local_repo(final_output_dir, nodes_subdirs)
+    elif args.reference_repo_dir:
+        final_output_dir = pathlib.Path(args.reference_repo_dir)
+        print(f"updating existing checkout in {final_output_dir}")
+        reference_repo_checkout = update_reference_repo(
+            final_output_dir,
+            args.reference_repo_url,
+            args.reference_repo_ref,
+            nodes_subdirs,
+        )
     else:
-        nodes_to_process = conn.baremetal.nodes()
+        base_dir = pathlib.Path("./output")
+        base_dir.mkdir(exist_ok=True)
 
-    for node in nodes_to_process:
-        blazar_host = ironic_uuid_to_blazar_hosts.get(node.id)
+        final_output_dir = base_dir.joinpath("reference-repository")
+        print(f"final output dir will be {final_output_dir}")
+        if final_output_dir.exists():
+            unique_id = uuid.uuid4().hex[0:8]
+            archive_dir = base_dir.joinpath(f"reference-repository-{unique_id}")
+            print(f"moving existing output dir to {archive_dir}")
+            shutil.move(str(final_output_dir), str(archive_dir))
 
-        # HACK: convert back to the form the API returns, instead of using properties field
-        blazar_host_dict = blazar_host.to_dict()
-        blazar_host_properties = blazar_host_dict.pop("properties")
-        blazar_host_dict.update(blazar_host_properties)
+        local_dir = TemporaryDirectory(dir=base_dir)
+        reference_repo_checkout = clone_reference_repo(
+            args.reference_repo_url,
+            args.reference_repo_ref,
+            local_dir.name,
+            sparse_paths=sparse_paths,
+        )
 
-        # For each node, get the inspection data from ironic_inspector
-        try:
-            inspection_dict = conn.baremetal_introspection.get_introspection_data(
-                introspection=node.id, processed=True
+    state = None
+    if args.incremental_state:
+        state = incremental.IncrementalState(args.incremental_state)
+    run_metrics = metrics.RunMetrics()
+    site_counts = {name: Counter() for name in cloud_names}
+    written_nodes = {name: {} for name in cloud_names}
+
+    # alternate between sites, so every site's API is fetched from at once
+    work = list(interleave(*([(site, node) for node in site.nodes] for site in sites)))
+
+    # fetch inspection data concurrently; map() yields results in node order,
+    # so output stays deterministic while conversion overlaps the fetching
+    with start_convert_pool(args.processes) as convert_executor, ThreadPoolExecutor(
+        max_workers=args.workers
+    ) as executor:
+        inspection_payloads = executor.map(
+            timed_call, [site.fetch for site, _ in work], [node for _, node in work]
+        )
+
+        def conversion_inputs():
+            for (site, node), (inspection_raw, fetch_seconds) in zip(
+                work, inspection_payloads
+            ):
+                node_id, node_name = node["id"], node["name"]
+                counts = site_counts[site.cloud_name]
+                blazar_host_dict = site.blazar_hosts.get(node_id)
+                run_metrics.record("fetch", fetch_seconds, node_id)
+
+                if inspection_raw is None:
+                    print(f"{node_id}:{node_name}: missing inspection data - skipping")
+                    counts["missing"] += 1
+                    continue
+                if capture_writer:
+                    capture_writer.put_introspection(node_id, inspection_raw)
+
+                input_hash = None
+                if state:
+                    input_hash = state.input_hash(inspection_raw, blazar_host_dict)
+                    node_json = reference_api.get_node_data_path(
+                        reference_repo_checkout.working_dir, site.cloud_name, node_id
+                    )
+                    if state.is_current(node_id, input_hash, node_json):
+                        counts["skipped"] += 1
+                        continue
+
+                yield (site, node, inspection_raw, input_hash), (
+                    inspection_raw,
+                    blazar_host_dict,
+                )
+
+        results = convert_in_order(
+            convert_executor,
+            conversion_inputs(),
+            window=args.processes * 4,
+            convert=convert,
+        )
+        for (site, node, inspection_raw, input_hash), result in results:
+            node_id, node_name = node["id"], node["name"]
+            validated_node, error, timings = result
+            for stage, seconds in timings.items():
+                run_metrics.record(stage, seconds, node_id)
+
+            if error:
+                print(f"{node_id}:{node_name}: failed to validate with error {error}")
+                if args.verbose:
+                    print(format_payload(inspection_raw))
+                site_counts[site.cloud_name]["failed"] += 1
+                continue
+
+            with run_metrics.timer("write", node_id):
+                written = reference_api.write_reference_repo(
+                    reference_repo_checkout.working_dir,
+                    site.cloud_name,
+                    validated_node,
+                )
+            if written.changed:
+                print(f"{node_id}:{node_name}: updated reference data")
+            if state:
+                state.record(node_id, input_hash, written.path)
+            written_nodes[site.cloud_name][written.path] = node
+
+    if capture_writer:
+        capture_writer.close()
+        print(f"captured inputs to {args.capture}")
+
+    for cloud_name, counts in site_counts.items():
+        # diff everything we wrote against the latest committed version in one go
+        with run_metrics.timer("diff"):
+            changes = reference_api.diff_reference_repo(
+                reference_repo_checkout, cloud_name
             )
-        except (BadRequestException, NotFoundException):
-            print(f"{node.id}:{node.name}: missing inspection data - skipping")
-            continue
+        site_written = written_nodes[cloud_name]
+        counts["added"] = len(set(changes.added).intersection(site_written))
+        counts["modified"] = len(set(changes.modified).intersection(site_written))
+        counts["unchanged"] = len(site_written) - counts["added"] - counts["modified"]
 
-        try:
-            i_data = inspector.InspectorResult(**inspection_dict)
-            b_data = blazar.Host(**blazar_host_dict)
-            validated_node = reference_repo.Node.from_inspector_result(b_data, i_data)
-        except ValidationError as ex:
-            print(f"{node.id}:{node.name}: failed to validate with error {repr(ex)}")
-            if args.verbose:
-                print(json.dumps(inspection_dict, indent=2))
-            continue
-
-        node_json = reference_api.write_reference_repo(
-            reference_repo_checkout.working_dir, cloud_name, validated_node
+        print(
+            f"{cloud_name} nodes: {counts['added']} added, "
+            f"{counts['modified']} modified, {counts['unchanged']} unchanged, "
+            f"{counts['skipped']} skipped, {counts['failed']} failed, "
+            f"{counts['missing']} missing inspection data"
         )
+        run_metrics.count_site(cloud_name, counts)
 
-        # diff the file we just wrote against the latest committed version
-        repo_diff = reference_repo_checkout.index.diff(None, paths=node_json)
-        if repo_diff:
-            print(f"{node.id}:{node.name}: updated reference data")
+    if state:
+        state.save()
+    if args.metrics_file:
+        run_metrics.write(args.metrics_file)
 
-    print(f"finished conversion, moving data from tmpdir to {final_output_dir}")
-    shutil.move(reference_repo_checkout.working_dir, final_output_dir)
+    if not args.reference_repo_dir:
+        print(f"finished conversion, moving data from tmpdir to {final_output_dir}")
+        shutil.move(reference_repo_checkout.working_dir, final_output_dir)
 
     if args.push_changes:
         commit_and_pr_changes(
             args.reference_repo_url,
             args.reference_repo_ref,
-            final_output_dir
+            final_output_dir,
+            sites=cloud_names,
         )
 
 
@@ -0,0 +1,117 @@
+import json
+import pathlib
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from reference_transmogrifier.fileutils import atomic_write
+
+METRIC_PREFIX = "reference_transmogrifier"
+
+# every node ends up with exactly one of these
+RESULTS = ("added", "modified", "unchanged", "skipped", "failed", "missing")
+
+
+def result_counter() -> Counter:
+    """A Counter with every result present, so zero counts are still reported."""
+    return Counter(dict.fromkeys(RESULTS, 0))
+
+
+class RunMetrics(object):
+    """Timings and counters collected over one conversion run.
+
+    Stage timings are kept per node (fetch, validate, convert, write) and
+    per run (e.g. the single git diff), and summed per stage. Counters track
+    how many nodes ended up added, modified, skipped, failed and so on,
+    per site and in total.
+    """
+
+    def __init__(self) -> None:
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.counters = result_counter()
+        self.site_counters = {}
+        self.node_timings = defaultdict(dict)
+        self.stage_seconds = Counter()
+
+    def record(self, stage: str, seconds: float, node_id: str = None) -> None:
+        self.stage_seconds[stage] += seconds
+        if node_id:
+            self.node_timings[node_id][stage] = seconds
+
+    def count_site(self, site: str, counts: Counter) -> None:
+        self.site_counters.setdefault(site, result_counter()).update(counts)
+        self.counters.update(counts)
+
+    @contextmanager
+    def timer(self, stage: str, node_id: str = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, node_id)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        return {
+            "start_time": self.start_time,
+            "elapsed_seconds": round(self.elapsed, 6),
+            "nodes": dict(self.counters),
+            "sites": {site: dict(c) for site, c in self.site_counters.items()},
+            "stage_seconds": {k: round(v, 6) for k, v in self.stage_seconds.items()},
+            "node_timings": {
+                node_id: {k: round(v, 6) for k, v in timings.items()}
+                for node_id, timings in self.node_timings.items()
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        """Render in the Prometheus textfile collector format.
+
+        Per-node timings are left out, to keep label cardinality bounded.
+        """
+        lines = [
+            f"# HELP {METRIC_PREFIX}_nodes Nodes in the last run, by site and "
+            "result",
+            f"# TYPE {METRIC_PREFIX}_nodes gauge",
+        ]
+        for site, counters in sorted(self.site_counters.items()):
+            for result, count in sorted(counters.items()):
+                lines.append(
+                    f'{METRIC_PREFIX}_nodes{{site="{site}",result="{result}"}} {count}'
+                )
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent in each stage, "
+            "summed over nodes",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds gauge",
+        ]
+        for stage, seconds in sorted(self.stage_seconds.items()):
+            lines.append(
+                f'{METRIC_PREFIX}_stage_seconds{{stage="{stage}"}} {seconds:.6f}'
+            )
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_run_seconds Wall clock duration of the run",
+            f"# TYPE {METRIC_PREFIX}_run_seconds gauge",
+            f"{METRIC_PREFIX}_run_seconds {self.elapsed:.6f}",
+            f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Start of the run",
+            f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_last_run_timestamp_seconds {self.start_time:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path) -> None:
+        """Write JSON, or Prometheus text format if the file ends in .prom."""
+        path = pathlib.Path(path)
+        if path.suffix == ".prom":
+            data = self.to_prometheus()
+        else:
+            data = json.dumps(self.to_dict(), indent=2)
+
+        # textfile collectors may read at any time, so replace atomically
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, data.encode("utf-8"), mode=0o644)
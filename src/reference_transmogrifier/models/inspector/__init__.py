@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from reference_transmogrifier.models.inspector import (
     dmi,
@@ -10,12 +10,28 @@ from reference_transmogrifier.models.inspector import (
 )
 
 
-class InspectorResult(BaseModel):
+class ConversionInspectorResult(BaseModel):
+    """The parts of the inspection data that Node.from_inspector_result reads.
+
+    Everything else, such as the raw configuration, NUMA topology, interface
+    listings and the bulk of extra hardware data, is skipped rather than
+    validated and kept around. Use InspectorResult to see the full data.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    inventory: inventory.ConversionInventory
+    pci_devices: List[pci.PciDevice]
+    dmi: dmi.ConversionDMI
+    cpu_arch: str
+    extra: extra_hardware.ConversionExtraHardware
+
+
+class InspectorResult(ConversionInspectorResult):
     inventory: inventory.Inventory
     root_disk: Optional[dict] = None
     boot_interface: str
     configuration: dict
-    pci_devices: List[pci.PciDevice]
     dmi: dmi.DMI
     numa_topology: dict
     all_interfaces: dict
@@ -23,6 +39,5 @@ class InspectorResult(BaseModel):
     macs: List[str]
     local_gb: int
     cpus: int
-    cpu_arch: str
     memory_mb: Optional[int] = None
     extra: extra_hardware.InspectorExtraHardware
@@ -43,7 +43,12 @@ class CPU(BaseModel):
             return int(speed_float * multiplier)
 
 
-class DMI(BaseModel):
+class ConversionDMI(BaseModel):
+    """Only the DMI fields read when converting to reference data."""
+
     bios: Bios
     cpu: List[CPU]
+
+
+class DMI(ConversionDMI):
     memory: dict
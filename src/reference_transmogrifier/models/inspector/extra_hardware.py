@@ -163,17 +163,13 @@ class Memory(BaseModel):
         return int(self.total.size.to("GiB"))
 
 
-class InspectorExtraHardware(BaseModel):
+class ConversionExtraHardware(BaseModel):
+    """Only the extra hardware fields read when converting to reference data."""
+
     disk: list[Disk]
-    system: dict
-    firmware: dict
     memory: Memory
     network: list[NetworkAdapter]
-    lldp: Optional[dict] = None
     cpu: CPU
-    numa: dict
-    ipmi: Optional[dict] = None
-    hw: dict
 
     @field_validator("network", mode="before")
     @classmethod
@@ -200,3 +196,12 @@ class InspectorExtraHardware(BaseModel):
             match_disk_name=True
         )
         return [Disk(**disk) for disk in filtered_v]
+
+
+class InspectorExtraHardware(ConversionExtraHardware):
+    system: dict
+    firmware: dict
+    lldp: Optional[dict] = None
+    numa: dict
+    ipmi: Optional[dict] = None
+    hw: dict
@@ -84,17 +84,22 @@ class SystemVendor(BaseModel):
     manufacturer: str
 
 
-class Inventory(BaseModel):
-    interfaces: List[NetworkInterface]
-    cpu: CPU
+class ConversionInventory(BaseModel):
+    """Only the inventory fields read when converting to reference data."""
+
     disks: List[Disk]
-    memory: dict
     system_vendor: SystemVendor
-    boot: dict
-    hostname: str
-    bmc_mac: Optional[str] = None
 
     @field_validator("disks", mode="before")
     @classmethod
     def filter_disks(cls, v: dict) -> List[Disk]:
         return filter_disks(v)
+
+
+class Inventory(ConversionInventory):
+    interfaces: List[NetworkInterface]
+    cpu: CPU
+    memory: dict
+    boot: dict
+    hostname: str
+    bmc_mac: Optional[str] = None
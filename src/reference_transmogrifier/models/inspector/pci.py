@@ -1,21 +1,28 @@
+import functools
+import hashlib
+import marshal
+import os
+import pathlib
+from collections import defaultdict
 from enum import Enum
-from typing import Dict
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
 
 from importlib.resources import files
 from pydantic import BaseModel, Field, computed_field
 
+from reference_transmogrifier.fileutils import atomic_write
 
-class PciProductInfo(BaseModel):
+
+class PciProductInfo(NamedTuple):
     device_name: str
-    subsystems: dict
+    # read-only view, keyed by (subvendor_id, subdevice_id)
+    subsystems: Mapping[Tuple[str, str], str]
 
 
-class PciVendorInfo(BaseModel):
+class PciVendorInfo(NamedTuple):
     vendor_name: str
 
-    # [str, dict] instead of [str, PciProductInfo] to avoid eagerly parsing every entry
-    devices: Dict[str, dict]
-
 
 class KnownPciClassEnum(str, Enum):
     mass_storage_controller = "01"
@@ -34,81 +41,215 @@ class KnownPciClassEnum(str, Enum):
     unassigned_class = "ff"
 
 
+CACHE_DIR_ENV_VAR = "REFERENCE_TRANSMOGRIFIER_CACHE_DIR"
+
+# bump when the layout of the cached index changes
+INDEX_CACHE_FORMAT = 1
+
+# parsed vendor blocks are large (Intel has thousands of devices), lookup
+# results are tiny, so keep few of the former and plenty of the latter
+VENDOR_BLOCK_CACHE_SIZE = 32
+LOOKUP_CACHE_SIZE = 4096
+
+
+def default_cache_dir() -> pathlib.Path:
+    """Per-user cache dir, overridable through the environment."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    if cache_dir:
+        return pathlib.Path(cache_dir)
+
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    if xdg_cache_home:
+        return pathlib.Path(xdg_cache_home, "reference-transmogrifier")
+    return pathlib.Path.home().joinpath(".cache", "reference-transmogrifier")
+
+
 class PciIdsMap(object):
-    def _load_pciids_file(self, pci_ids_file) -> Dict:
+    """Lazily indexed view of the pci.ids database.
+
+    Nothing is read at construction time. The first lookup does a single pass
+    over the file recording the byte range of each vendor block, and every
+    lookup after that seeks to and parses only the block it needs. Parsed
+    blocks and lookup results are kept in bounded LRU caches.
+    """
+
+    def __init__(self, pci_ids_file=None, cache_dir=None) -> None:
+        if pci_ids_file is None:
+            pci_ids_file = files("reference_transmogrifier.models.inspector").joinpath(
+                "pci.ids"
+            )
+        self.pci_ids_file = pci_ids_file
+        self.cache_dir = cache_dir
+        self._index = None
+
+        self._read_vendor = functools.lru_cache(maxsize=VENDOR_BLOCK_CACHE_SIZE)(
+            self._read_vendor
+        )
+        self.lookup_vendor = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(
+            self.lookup_vendor
+        )
+        self.lookup_product = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(
+            self.lookup_product
+        )
+
+    @staticmethod
+    def _build_index(pci_ids_file) -> Dict[str, Tuple[int, int]]:
+        """Map each top level id to the (start, end) byte offsets of its block."""
+        index = {}
+
+        current_id = None
+        current_start = 0
+        offset = 0
+
+        with pci_ids_file.open("rb") as file:
+            for line in file:
+                line_start = offset
+                offset += len(line)
+
+                # Only unindented, non-comment lines start a new block
+                if line[:1] in (b"\t", b"#", b"\n", b"\r") or not line.strip():
+                    continue
+
+                if current_id is not None:
+                    index[current_id] = (current_start, line_start)
+
+                parts = line.split(maxsplit=1)
+                if len(parts) == 2:
+                    current_id = parts[0].decode("utf-8")
+                    current_start = line_start
+                else:
+                    current_id = None
+
+        if current_id is not None:
+            index[current_id] = (current_start, offset)
+
+        return index
+
+    @staticmethod
+    def _parse_lines(lines) -> Dict:
         data = {}
 
         current_vendor_id = None
         current_device_id = None
 
-        with pci_ids_file.open("r") as file:
-            for line in file:
-                line = line.rstrip()
+        for line in lines:
+            line = line.rstrip()
 
-                # Skip comments and empty lines
-                if not line or line.startswith("#"):
-                    continue
+            # Skip comments and empty lines
+            if not line or line.startswith("#"):
+                continue
+
+            # Detect the indentation level
+            indent_level = len(line) - len(line.lstrip())
+            line = line.lstrip()
+
+            # Vendor line (no indentation)
+            if indent_level == 0:
+                parts = line.split(maxsplit=1)
+                if len(parts) == 2:
+                    current_vendor_id, vendor_name = parts
+                    data[current_vendor_id] = {
+                        "vendor_name": vendor_name,
+                        "devices": {},
+                    }
 
-                # Detect the indentation level
-                indent_level = len(line) - len(line.lstrip())
-                line = line.lstrip()
-
-                # Vendor line (no indentation)
-                if indent_level == 0:
-                    parts = line.split(maxsplit=1)
-                    if len(parts) == 2:
-                        current_vendor_id, vendor_name = parts
-                        data[current_vendor_id] = {
-                            "vendor_name": vendor_name,
-                            "devices": {},
+            # Device line (single level of indentation)
+            elif indent_level == 1 or line.startswith("\t"):
+                parts = line.split(maxsplit=1)
+                if len(parts) == 2:
+                    current_device_id, device_name = parts
+                    if current_vendor_id is not None:
+                        data[current_vendor_id]["devices"][current_device_id] = {
+                            "device_name": device_name,
+                            "subsystems": {},
                         }
 
-                # Device line (single level of indentation)
-                elif indent_level == 1 or line.startswith("\t"):
-                    parts = line.split(maxsplit=1)
-                    if len(parts) == 2:
-                        current_device_id, device_name = parts
-                        if current_vendor_id is not None:
-                            data[current_vendor_id]["devices"][current_device_id] = {
-                                "device_name": device_name,
-                                "subsystems": {},
-                            }
-
-                # Subsystem line (double level of indentation)
-                elif indent_level == 2 or line.startswith("\t\t"):
-                    parts = line.split(maxsplit=2)
-                    if len(parts) == 3:
-                        subvendor_id, subdevice_id, subsystem_name = parts
-                        if (
-                            current_vendor_id is not None
-                            and current_device_id is not None
-                        ):
-                            subsystem_key = (subvendor_id, subdevice_id)
-                            data[current_vendor_id]["devices"][current_device_id][
-                                "subsystems"
-                            ][subsystem_key] = subsystem_name
+            # Subsystem line (double level of indentation)
+            elif indent_level == 2 or line.startswith("\t\t"):
+                parts = line.split(maxsplit=2)
+                if len(parts) == 3:
+                    subvendor_id, subdevice_id, subsystem_name = parts
+                    if current_vendor_id is not None and current_device_id is not None:
+                        subsystem_key = (subvendor_id, subdevice_id)
+                        data[current_vendor_id]["devices"][current_device_id][
+                            "subsystems"
+                        ][subsystem_key] = subsystem_name
 
         return data
 
-    def __init__(self) -> None:
-        pci_ids_file = files("reference_transmogrifier.models.inspector").joinpath("pci.ids")
-        self.data = self._load_pciids_file(pci_ids_file)
+    def _load_cached_index(self) -> Dict[str, Tuple[int, int]]:
+        """Load the index from the on-disk cache, building it on a miss.
+
+        Cache entries are keyed by the sha256 of pci.ids, so shipping a new
+        pci.ids invalidates them. The cache is best effort: if the cache dir
+        can't be read or written we just use the freshly built index.
+        """
+        with self.pci_ids_file.open("rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+
+        cache_dir = pathlib.Path(self.cache_dir or default_cache_dir())
+        cache_path = cache_dir.joinpath(f"pci-ids-v{INDEX_CACHE_FORMAT}-{digest}.idx")
+
+        try:
+            # marshal.load() on a file does many tiny reads, loads() is ~10x faster
+            with open(cache_path, "rb") as f:
+                return marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+        index = self._build_index(self.pci_ids_file)
+
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write(cache_path, marshal.dumps(index))
+
+            # Entries for other pci.ids files may belong to other installs
+            # sharing this cache dir, so only drop older index formats.
+            for entry in cache_dir.glob("pci-ids-v*-*.idx"):
+                version = entry.name[len("pci-ids-v"):].split("-", 1)[0]
+                if version.isdigit() and int(version) < INDEX_CACHE_FORMAT:
+                    entry.unlink()
+        except OSError:
+            pass
+
+        return index
+
+    @property
+    def index(self) -> Dict[str, Tuple[int, int]]:
+        if self._index is None:
+            self._index = self._load_cached_index()
+        return self._index
+
+    def _read_vendor(self, vendor_id: str) -> Optional[Dict]:
+        offsets = self.index.get(vendor_id)
+        if not offsets:
+            return None
+
+        start, end = offsets
+        with self.pci_ids_file.open("rb") as file:
+            file.seek(start)
+            block = file.read(end - start).decode("utf-8")
+
+        return self._parse_lines(block.splitlines()).get(vendor_id)
 
     def lookup_vendor(self, vendor_id: str) -> PciVendorInfo:
-        result = self.data.get(vendor_id)
+        result = self._read_vendor(vendor_id)
         if not result:
             raise KeyError(f"vendor_id: {vendor_id} not found in pci ids db")
-        return PciVendorInfo(**result)
+        return PciVendorInfo(vendor_name=result["vendor_name"])
 
     def lookup_product(self, vendor_id: str, product_id: str) -> PciProductInfo:
-        vendor = self.lookup_vendor(vendor_id)
-        product = vendor.devices.get(product_id)
-        if not (vendor and product):
+        vendor = self._read_vendor(vendor_id)
+        product = vendor["devices"].get(product_id) if vendor else None
+        if not product:
             raise KeyError(f"({vendor_id},{product_id}) not found in pci ids db")
-        return PciProductInfo(**product)
+        return PciProductInfo(
+            device_name=product["device_name"],
+            subsystems=MappingProxyType(product["subsystems"]),
+        )
 
 
-# initialize on import so we don't reload it constantly
+# cheap to construct, the index is only built on the first lookup
 PCI_MAP = PciIdsMap()
 
 
@@ -137,3 +278,47 @@ class PciDevice(BaseModel):
     def pci_class_enum(self) -> KnownPciClassEnum:
         """Use first two characters of PCI class hex to look up"""
         return KnownPciClassEnum(self.pci_class[0:2])
+
+
+class PciDeviceIndex(object):
+    """A node's PCI devices, bucketed by class and by IDs in a single pass.
+
+    Buckets are keyed by the raw two character class prefix (the values of
+    KnownPciClassEnum) and by (vendor_id, product_id, pci_class), so no enum
+    is constructed per device and devices of unknown classes are simply
+    never matched. Vendor and product names are left to the matched
+    devices' computed fields, and so are only looked up when used.
+    """
+
+    def __init__(self, devices: Iterable[PciDevice]) -> None:
+        self.devices = list(devices)
+        self._by_class = defaultdict(list)
+        self._by_ids = defaultdict(list)
+        for position, device in enumerate(self.devices):
+            self._by_class[device.pci_class[0:2].lower()].append(position)
+            self._by_ids[
+                (device.vendor_id, device.product_id, device.pci_class)
+            ].append(position)
+
+    @classmethod
+    def of(cls, devices) -> "PciDeviceIndex":
+        """Index a list of devices, or return an existing index unchanged."""
+        if isinstance(devices, cls):
+            return devices
+        return cls(devices)
+
+    def match(
+        self,
+        classes: Iterable[KnownPciClassEnum] = (),
+        ids: Iterable[Tuple[str, str, str]] = (),
+    ) -> List[PciDevice]:
+        """Devices in any of ``classes`` or with any of ``ids``, in input order.
+
+        ``ids`` are (vendor_id, product_id, pci_class) tuples.
+        """
+        positions = set()
+        for pci_class in classes:
+            positions.update(self._by_class.get(pci_class.value, ()))
+        for device_ids in ids:
+            positions.update(self._by_ids.get(tuple(device_ids), ()))
+        return [self.devices[p] for p in sorted(positions)]
@@ -1,13 +1,15 @@
 import datetime
+import functools
 from collections import namedtuple
 from enum import Enum
-from typing import Optional
+from typing import Optional, Union
 
 from pydantic import UUID4, BaseModel, field_validator, computed_field, Field
 from pydantic.functional_validators import BeforeValidator
 from typing_extensions import Annotated, Self
 
 from reference_transmogrifier.models import blazar, inspector
+from reference_transmogrifier.models.vocabulary import VOCABULARY
 
 
 class NodeTypeEnum(str, Enum):
@@ -71,51 +73,40 @@ class ManufacturerEnum(str, Enum):
     sandisk = "Sandisk"
 
 
+def vocabulary_table(section: str, table: str, enum_cls, key=str) -> dict:
+    """Map the raw names of a vocabulary table to members of ``enum_cls``.
+
+    Raises ValueError at import time if an entry's canonical name is not a
+    value of the enum, so a bad override file fails fast.
+    """
+    return {
+        key(name): enum_cls(canonical)
+        for name, canonical in VOCABULARY[section][table].items()
+    }
+
+
+# Lookups are by the whole lowercased name first, then by its first word.
+# Only a few complex names are mapped in full; mapping everything by the
+# first word would be risky for something like "advanced" to AMD.
+MANUFACTURER_FULL_NAMES = vocabulary_table(
+    "manufacturers", "full_names", ManufacturerEnum, key=str.lower
+)
+MANUFACTURER_ALIASES = vocabulary_table(
+    "manufacturers", "aliases", ManufacturerEnum, key=str.lower
+)
+
+
+@functools.lru_cache(maxsize=1024)
 def normalize_manufacturer(name: str) -> ManufacturerEnum:
     """Coerce inputs to canonical representation."""
     name = name.strip().lower()
-    norm_name = name.split(" ")[0]
-
-    # I'm being conservative here and mapping *slightly* more
-    # complex cases and otherwise falling back to the previous
-    # behavior to minimize risk of breakage. But it seems a bit
-    # risky to map everything based on the first word, especially
-    # something like "advanced" to AMD.
-    full_name_mapping = {
-        "advanced micro devices, inc. [amd/ati]": ManufacturerEnum.amd,
-    }
-    if name in full_name_mapping:
-        return full_name_mapping[name]
-
-    norm_name_mapping = {
-        "altera": ManufacturerEnum.altera,
-        "broadcom": ManufacturerEnum.broadcom,
-        "cavium": ManufacturerEnum.cavium,
-        "dell": ManufacturerEnum.dell,
-        "fujitsu": ManufacturerEnum.fujitsu,
-        "gigabyte": ManufacturerEnum.gigabyte,
-        "amd": ManufacturerEnum.amd,
-        "intel": ManufacturerEnum.intel,
-        "genuineintel": ManufacturerEnum.intel,
-        "matrox": ManufacturerEnum.matrox,
-        "micron": ManufacturerEnum.micron,
-        "mellanox": ManufacturerEnum.mellanox,
-        "nvidia": ManufacturerEnum.nvidia,
-        "phison": ManufacturerEnum.phison,
-        "samsung": ManufacturerEnum.samsung,
-        "seagate": ManufacturerEnum.seagate,
-        "toshiba": ManufacturerEnum.toshiba,
-        "qlogic": ManufacturerEnum.qlogic,
-        "xilinx": ManufacturerEnum.xilinx,
-        "sandisk": ManufacturerEnum.sandisk,
-    }
-    try:
-        assert norm_name in norm_name_mapping
-    except Exception as exc:
-        print(f"got {norm_name} from {name}")
-        raise (exc)
+    if name in MANUFACTURER_FULL_NAMES:
+        return MANUFACTURER_FULL_NAMES[name]
 
-    return norm_name_mapping[norm_name]
+    norm_name = name.split(" ")[0]
+    if norm_name not in MANUFACTURER_ALIASES:
+        raise ValueError(f"unknown manufacturer {norm_name!r} from {name!r}")
+    return MANUFACTURER_ALIASES[norm_name]
 
 
 # type alias to make calling it easy
@@ -194,6 +185,9 @@ class ChassisModelEnum(str, Enum):
     gigabyte_r181_t92 = "R181-T92-00"
 
 
+CHASSIS_MODELS = vocabulary_table("chassis_models", "aliases", ChassisModelEnum)
+
+
 class Chassis(BaseModel):
     manufacturer: Optional[NormalizedManufacturer] = None
     name: Optional[ChassisModelEnum] = None
@@ -215,36 +209,11 @@ class Chassis(BaseModel):
         if not v or not isinstance(v, str):
             return None
 
-        model_map = {
-            "PowerEdge C4130": ChassisModelEnum.dell_c4130,
-            "PowerEdge C4140": ChassisModelEnum.dell_c4140,
-            "PowerEdge FC430": ChassisModelEnum.dell_fc430,
-            "FX700": ChassisModelEnum.dell_fx700,
-            "PowerEdge FX700": ChassisModelEnum.dell_fx700,
-            "PowerEdge R630": ChassisModelEnum.dell_r630,
-            "PowerEdge R650": ChassisModelEnum.dell_r650,
-            "PowerEdge R730": ChassisModelEnum.dell_r730,
-            "PowerEdge R740": ChassisModelEnum.dell_r740,
-            "PowerEdge R740xd": ChassisModelEnum.dell_r740xd,
-            "PowerEdge R740xa": ChassisModelEnum.dell_r740xa,
-            "PowerEdge R750": ChassisModelEnum.dell_r750,
-            "PowerEdge R750xa": ChassisModelEnum.dell_r750xa,
-            "PowerEdge R6525": ChassisModelEnum.dell_r6525,
-            "PowerEdge R7525": ChassisModelEnum.dell_r7525,
-            "PowerEdge R840": ChassisModelEnum.dell_r840,
-            "PowerEdge XE8545": ChassisModelEnum.dell_xe8545,
-            "R181-T92-00": ChassisModelEnum.gigabyte_r181_t92,
-        }
-
-        model = v.split("(")[0].strip()
         # PowerEdge R630 (SKU=NotP...delName=PowerEdge R630)
-        try:
-            assert model in model_map
-        except ValueError as exc:
-            print(repr(model))
-            raise (exc)
-
-        return model_map[model]
+        model = v.split("(")[0].strip()
+        if model not in CHASSIS_MODELS:
+            raise ValueError(f"unknown chassis model {model!r}")
+        return CHASSIS_MODELS[model]
 
 
 #
@@ -336,6 +305,14 @@ class StorageMediaTypeEnum(str, Enum):
     rotational = "Rotational"
 
 
+STORAGE_INTERFACES = vocabulary_table(
+    "storage_interfaces", "aliases", StorageInterfaceEnum
+)
+STORAGE_MEDIA_TYPES = vocabulary_table(
+    "storage_media_types", "aliases", StorageMediaTypeEnum
+)
+
+
 class StorageDevice(BaseModel):
     device: str
     interface: Optional[StorageInterfaceEnum] = None
@@ -359,17 +336,21 @@ class StorageDevice(BaseModel):
         else:
             return v
 
+    @field_validator("interface", mode="before")
+    @classmethod
+    def _coerce_interface(cls, v) -> Optional[StorageInterfaceEnum]:
+        if v is None:
+            return None
+        if v not in STORAGE_INTERFACES:
+            raise ValueError(f"unknown storage interface {v!r}")
+        return STORAGE_INTERFACES[v]
+
     @field_validator("media_type", mode="before")
     @classmethod
     def _coerce_mediatype(cls, v) -> StorageMediaTypeEnum:
-        mediatype_map = {
-            "HDD": StorageMediaTypeEnum.rotational,
-            "Rotational": StorageMediaTypeEnum.rotational,
-            "SSD": StorageMediaTypeEnum.ssd,
-        }
-
-        assert v in mediatype_map
-        return mediatype_map[v]
+        if v not in STORAGE_MEDIA_TYPES:
+            raise ValueError(f"unknown storage media type {v!r}")
+        return STORAGE_MEDIA_TYPES[v]
 
     def __lt__(self: Self, other: Self):
         return self.device < other.device
@@ -429,14 +410,17 @@ class Node(BaseModel):
     uid: UUID4
 
     @classmethod
-    def find_gpu_from_pci(cls, data: list[inspector.pci.PciDevice]) -> GPU:
+    def find_gpu_from_pci(
+        cls, data: Union[list[inspector.pci.PciDevice], inspector.pci.PciDeviceIndex]
+    ) -> GPU:
         """Find all PCIe devices of the "display" class type, and exclude matrox integrated GPU."""
-        pci_class = inspector.pci.KnownPciClassEnum.display_controller
         matrox_vendor_id = "102b"
         gpus = [
             d
-            for d in data
-            if d.pci_class_enum == pci_class and d.vendor_id != matrox_vendor_id
+            for d in inspector.pci.PciDeviceIndex.of(data).match(
+                classes=[inspector.pci.KnownPciClassEnum.display_controller]
+            )
+            if d.vendor_id != matrox_vendor_id
         ]
         if not gpus:
             return GPU(gpu=False)
@@ -449,16 +433,13 @@ class Node(BaseModel):
         )
 
     @classmethod
-    def find_fpga_from_pci(cls, data: list[inspector.pci.PciDevice]) -> FPGA:
-        fpgas = [
-            d
-            for d in data
-            if (
-                d.pci_class_enum
-                == inspector.pci.KnownPciClassEnum.processing_accelerator
-            )
-            or (PCI_Tuple(d.vendor_id, d.product_id, d.pci_class) in FPGA_lookup)
-        ]
+    def find_fpga_from_pci(
+        cls, data: Union[list[inspector.pci.PciDevice], inspector.pci.PciDeviceIndex]
+    ) -> FPGA:
+        fpgas = inspector.pci.PciDeviceIndex.of(data).match(
+            classes=[inspector.pci.KnownPciClassEnum.processing_accelerator],
+            ids=FPGA_lookup,
+        )
         if fpgas:
             return FPGA(
                 board_model=fpgas[0].product_name,
@@ -511,33 +492,54 @@ class Node(BaseModel):
         cls,
         inventory_disks: list[inspector.inventory.Disk],
         extra_disks: list[inspector.extra_hardware.Disk],
-    ) -> list[inspector.extra_hardware.Disk]:
+    ) -> list[StorageDevice]:
+        """Pair each extra hardware disk with its inventory disk.
+
+        Disks are matched by WWN, or by serial number for extra disks that
+        have no WWN. Raises ValueError if a disk can't be matched to exactly
+        one inventory disk.
+        """
         if len(inventory_disks) != len(extra_disks):
             raise ValueError("different # of disks in inventory and extra data.")
 
-        input_values = {}
-        for d in inventory_disks:
-            input_values.setdefault(d.wwn, {})
-            input_values[d.wwn]["inv"] = d
-        for d in extra_disks:
-            if d.wwn:
-                input_values[d.wwn]["extra"] = d
-            elif d.serial:
-                matching_inv_wwn = [
-                    input_wwn
-                    for input_wwn, input_values in input_values.items()
-                    if input_values["inv"].serial == d.serial
-                ][0]
-                input_values[matching_inv_wwn]["extra"] = d
-
-        output_list = []
+        inventory_by_wwn = {}
+        inventory_by_serial = {}
+        for inv in inventory_disks:
+            if inv.wwn in inventory_by_wwn:
+                raise ValueError(f"duplicate WWN {inv.wwn} in inventory disks")
+            inventory_by_wwn[inv.wwn] = inv
+            # serials only matter for disks without a WWN, so duplicates are
+            # only an error if such a disk needs one of them
+            inventory_by_serial.setdefault(inv.serial, []).append(inv)
+
+        disk_pairs = {}
+        for extra in extra_disks:
+            if extra.wwn:
+                inv = inventory_by_wwn.get(extra.wwn)
+                if inv is None:
+                    raise ValueError(
+                        f"no inventory disk with WWN {extra.wwn} for {extra.name}"
+                    )
+            elif extra.serial:
+                matches = inventory_by_serial.get(extra.serial, [])
+                if len(matches) != 1:
+                    raise ValueError(
+                        f"{len(matches)} inventory disks with serial "
+                        f"{extra.serial} for {extra.name}"
+                    )
+                inv = matches[0]
+            else:
+                raise ValueError(f"no WWN or serial to match disk {extra.name}")
 
-        for wwn, d in input_values.items():
-            inv = d["inv"]
-            assert isinstance(inv, inspector.inventory.Disk)
-            extra = d["extra"]
-            assert isinstance(extra, inspector.extra_hardware.Disk)
+            if inv.wwn in disk_pairs:
+                raise ValueError(
+                    f"inventory disk {inv.wwn} matches both "
+                    f"{disk_pairs[inv.wwn][1].name} and {extra.name}"
+                )
+            disk_pairs[inv.wwn] = (inv, extra)
 
+        output_list = []
+        for inv, extra in disk_pairs.values():
             rev = extra.smart_firmware_version
             if not rev:
                 rev = extra.rev
@@ -572,12 +574,13 @@ class Node(BaseModel):
                 vendor=vendor,
             )
             output_list.append(disk_model)
-            output_list.sort()
+
+        output_list.sort()
         return output_list
 
     @classmethod
     def from_inspector_result(
-        cls, blazar_data: blazar.Host, idata: inspector.InspectorResult
+        cls, blazar_data: blazar.Host, idata: inspector.ConversionInspectorResult
     ) -> Self:
         """Generate Node object from ironic inspector data and known external data."""
 
@@ -599,8 +602,9 @@ class Node(BaseModel):
             manufacturer=idata.inventory.system_vendor.manufacturer,
             serial=idata.inventory.system_vendor.serial_number,
         )
-        fpga = cls.find_fpga_from_pci(idata.pci_devices)
-        gpu = cls.find_gpu_from_pci(idata.pci_devices)
+        pci_index = inspector.pci.PciDeviceIndex(idata.pci_devices)
+        fpga = cls.find_fpga_from_pci(pci_index)
+        gpu = cls.find_gpu_from_pci(pci_index)
         main_memory = MainMemory(
             ram_size=idata.extra.memory.total_size_bytes,
             humanized_ram_size=f"{idata.extra.memory.total_size_gib} GiB",
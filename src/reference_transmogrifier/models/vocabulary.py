@@ -0,0 +1,38 @@
+"""Tables mapping raw hardware strings to the reference repo's canonical names.
+
+The defaults ship in vocabulary.json. Set REFERENCE_TRANSMOGRIFIER_VOCABULARY
+to a JSON file with the same layout to add or override entries without
+changing code, e.g.:
+
+    {"manufacturers": {"aliases": {"hgst": "Seagate"}}}
+
+Values are the canonical strings, i.e. the values of the enums in
+reference_repo, which turns them into enum members when it is imported.
+"""
+
+import json
+import os
+from importlib.resources import files
+from typing import Optional
+
+VOCABULARY_ENV_VAR = "REFERENCE_TRANSMOGRIFIER_VOCABULARY"
+
+
+def override_file() -> Optional[str]:
+    return os.environ.get(VOCABULARY_ENV_VAR) or None
+
+
+def load_vocabulary(override=None) -> dict:
+    """Load the default tables, merging in the entries from an override file."""
+    data = files("reference_transmogrifier.models").joinpath("vocabulary.json")
+    vocabulary = json.loads(data.read_text(encoding="utf-8"))
+    if override:
+        with open(override, "r") as f:
+            overrides = json.load(f)
+        for section, tables in overrides.items():
+            for table, entries in tables.items():
+                vocabulary.setdefault(section, {}).setdefault(table, {}).update(entries)
+    return vocabulary
+
+
+VOCABULARY = load_vocabulary(override_file())
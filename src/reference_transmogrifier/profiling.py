@@ -0,0 +1,93 @@
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import threading
+from typing import Optional
+
+# number of functions listed in the summary
+SUMMARY_TOP_N = 30
+
+
+class Profiler(object):
+    """cProfile wrapper used by the --profile options.
+
+    Either profile a whole run between enable() and disable(), or only the
+    calls made through functions passed to wrap(). report() saves the stats
+    for later inspection (e.g. with snakeviz or `python -m pstats`) and
+    prints the hottest functions by cumulative time.
+
+    While enabled, threads started in the meantime (e.g. the fetch pools)
+    get a profile of their own, which is merged into the report. Work done
+    in child processes is not profiled.
+    """
+
+    def __init__(self, stats_file) -> None:
+        self.stats_file = stats_file
+        self.profile = cProfile.Profile()
+        self.thread_profiles = []
+
+    def _start_thread(self, frame, event, arg) -> None:
+        # installed through threading.setprofile(); runs once at the start
+        # of each new thread and replaces itself with a per-thread profile
+        profile = cProfile.Profile()
+        self.thread_profiles.append(profile)
+        profile.enable()
+
+    def enable(self) -> None:
+        threading.setprofile(self._start_thread)
+        self.profile.enable()
+
+    def disable(self) -> None:
+        self.profile.disable()
+        threading.setprofile(None)
+
+    def wrap(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.profile.disable()
+
+        return wrapper
+
+    def stats(self, stream=None) -> Optional[pstats.Stats]:
+        """Merged stats of every profile, or None if no calls were profiled."""
+        profiles = [
+            p for p in [self.profile] + self.thread_profiles if p.getstats()
+        ]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=stream)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def summary(self, top_n=SUMMARY_TOP_N) -> str:
+        stream = io.StringIO()
+        stats = self.stats(stream=stream)
+        if stats is None:
+            return "no calls were profiled"
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+        return stream.getvalue()
+
+    def report(self, top_n=SUMMARY_TOP_N) -> None:
+        """Save and summarize the stats.
+
+        Called from a finally block, so it must not raise and hide the
+        run's own exception or exit status.
+        """
+        stats = self.stats()
+        if stats is None:
+            print("no calls were profiled")
+            return
+        print(self.summary(top_n))
+        try:
+            stats.dump_stats(self.stats_file)
+        except OSError as e:
+            print(f"could not write profile stats: {e}", file=sys.stderr)
+        else:
+            print(f"wrote profile stats to {self.stats_file}")
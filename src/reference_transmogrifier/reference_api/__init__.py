@@ -1,5 +1,11 @@
+import os
 import pathlib
+import stat
+from typing import List, NamedTuple
 
+from git import Repo
+
+from reference_transmogrifier.fileutils import atomic_write
 from reference_transmogrifier.models import reference_repo
 
 REGION_NAME_MAP = {
@@ -9,22 +15,80 @@ REGION_NAME_MAP = {
 }
 
 
-def write_reference_repo(
-    repo_dir, cloud_name, node: reference_repo.Node
-) -> pathlib.Path:
-    repo_path = pathlib.Path(repo_dir)
-    node_data_path = repo_path.joinpath(
-        "data/chameleoncloud/sites",
+def get_sites_dir(repo_dir) -> pathlib.Path:
+    return pathlib.Path(repo_dir).joinpath("data/chameleoncloud/sites")
+
+
+def get_node_data_dir(repo_dir, cloud_name) -> pathlib.Path:
+    return get_sites_dir(repo_dir).joinpath(
         cloud_name,
         "clusters/chameleon/nodes",
-        f"{node.uid}.json",
     )
-    with open(node_data_path, "w") as f:
-        f.write(
-            node.model_dump_json(
-                exclude_none=True,
-                exclude_unset=True,
-                indent=2,
-            )
-        )
-    return node_data_path
+
+
+def get_node_data_path(repo_dir, cloud_name, node_uid) -> pathlib.Path:
+    return get_node_data_dir(repo_dir, cloud_name).joinpath(f"{node_uid}.json")
+
+
+class WriteResult(NamedTuple):
+    path: pathlib.Path
+    changed: bool
+
+
+def write_reference_repo(
+    repo_dir, cloud_name, node: reference_repo.Node
+) -> WriteResult:
+    """Write a node's reference data, only touching the file if it changed.
+
+    The new contents are written to a temp file and renamed into place, so the
+    file is never left half written and unchanged files keep their mtime.
+    """
+    node_data_path = get_node_data_path(repo_dir, cloud_name, node.uid)
+    data = node.model_dump_json(
+        exclude_none=True,
+        exclude_unset=True,
+        indent=2,
+    ).encode("utf-8")
+
+    try:
+        with open(node_data_path, "rb") as f:
+            if f.read() == data:
+                return WriteResult(path=node_data_path, changed=False)
+        mode = stat.S_IMODE(os.stat(node_data_path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+
+    atomic_write(node_data_path, data, mode=mode)
+    return WriteResult(path=node_data_path, changed=True)
+
+
+class NodeDataChanges(NamedTuple):
+    added: List[pathlib.Path]
+    modified: List[pathlib.Path]
+    deleted: List[pathlib.Path]
+
+
+def diff_reference_repo(repo: Repo, cloud_name) -> NodeDataChanges:
+    """Compare a site's node data in the working tree with the checked out commit.
+
+    Uses a single `git status` over the nodes directory, rather than a diff
+    per node.
+    """
+    repo_path = pathlib.Path(repo.working_dir)
+    nodes_dir = get_node_data_dir("", cloud_name).as_posix()
+    status = repo.git.status(
+        "--porcelain", "-z", "--untracked-files=all", "--", nodes_dir
+    )
+
+    changes = NodeDataChanges(added=[], modified=[], deleted=[])
+    for entry in status.split("\0"):
+        if not entry:
+            continue
+        code, path = entry[:2], repo_path.joinpath(entry[3:])
+        if code == "??" or "A" in code:
+            changes.added.append(path)
+        elif "D" in code:
+            changes.deleted.append(path)
+        else:
+            changes.modified.append(path)
+    return changes
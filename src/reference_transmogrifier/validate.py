@@ -1,37 +1,236 @@
 import argparse
-
-from glob import glob
 import json
+import os
+import pathlib
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from git import Repo
 from pydantic import ValidationError
 
+from reference_transmogrifier import profiling, reference_api
+from reference_transmogrifier.cliutils import positive_int
 from reference_transmogrifier.models import reference_repo as reference_repo_model
 
+
+class NodeValidation(NamedTuple):
+    path: str
+    site: Optional[str]
+    uid: Optional[str]
+    node_name: Optional[str]
+    error: Optional[str]
+
+
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("reference_repo_dir")
+    parser.add_argument(
+        "--processes",
+        type=positive_int,
+        default=None,
+        help="Number of processes used to validate files, defaults to the CPU count",
+    )
+    parser.add_argument(
+        "--sites",
+        nargs="+",
+        help="Only validate these sites. Example: `--sites uc tacc`",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Only validate node files that differ from this git ref",
+    )
+    parser.add_argument(
+        "--summary-file",
+        help="Write a JSON summary of the run to this file, or '-' for stdout",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="STATS_FILE",
+        help="Profile the run with cProfile, writing stats to this file and "
+        "printing the most expensive functions. Files are validated in-process.",
+    )
+    parser.add_argument(
+        "--profile-scope",
+        choices=["run", "validation"],
+        default="run",
+        help="Profile the whole run, or only the validation of each node file",
+    )
     return parser.parse_args()
 
 
-def find_node_json(reference_repo_dir):
-    fnames = glob(f"{reference_repo_dir}/**/nodes/*.json", recursive=True)
-    for fname in fnames:
-        with open(fname, 'r') as f:
-            yield json.load(f)
+def find_sites(reference_repo_dir) -> List[str]:
+    with os.scandir(reference_api.get_sites_dir(reference_repo_dir)) as entries:
+        return sorted(e.name for e in entries if e.is_dir())
 
-def main():
-    args = parse_args()
 
-    node_jsons = find_node_json(args.reference_repo_dir)
-    for node in node_jsons:
-        node_uuid = node.get('uid')
-        node_name = node.get('node_name')
-        # site = xxx
-        
+def find_node_json(reference_repo_dir, sites=None) -> List[str]:
+    """List node files by walking only the known nodes directory of each site."""
+    if sites is None:
+        sites = find_sites(reference_repo_dir)
+
+    fnames = []
+    for site in sites:
+        nodes_dir = reference_api.get_node_data_dir(reference_repo_dir, site)
         try:
-            validated_node = reference_repo_model.Node.model_validate(node)
-        except ValidationError as e:
-            print(f"Validation error for node {node_uuid}:{node_name} {e}")
+            with os.scandir(nodes_dir) as entries:
+                fnames.extend(
+                    e.path for e in entries if e.name.endswith(".json") and e.is_file()
+                )
+        except FileNotFoundError:
             continue
+    return sorted(fnames)
+
+
+def find_changed_node_json(reference_repo_dir, ref, sites=None) -> List[str]:
+    """List node files that were added or modified relative to a git ref.
+
+    Untracked node files, e.g. ones just written by a conversion run, count
+    as added.
+    """
+    if sites is None:
+        sites = find_sites(reference_repo_dir)
+
+    nodes_dirs = [reference_api.get_node_data_dir("", s).as_posix() for s in sites]
+    repo = Repo(reference_repo_dir)
+    changed = repo.git.diff(
+        "--name-only", "--diff-filter=d", "-z", ref, "--", *nodes_dirs
+    )
+    untracked = repo.git.ls_files(
+        "--others", "--exclude-standard", "-z", "--", *nodes_dirs
+    )
+    repo_path = pathlib.Path(repo.working_dir)
+    return sorted(
+        str(repo_path.joinpath(f))
+        for f in set(changed.split("\0") + untracked.split("\0"))
+        if f.endswith(".json")
+    )
+
+
+def site_from_path(path) -> Optional[str]:
+    """Site name from a .../sites/<site>/clusters/... path, if it has one."""
+    parts = pathlib.Path(path).parts
+    if "sites" in parts[:-1]:
+        return parts[parts.index("sites") + 1]
+    return None
+
+
+def validate_node_file(path) -> NodeValidation:
+    """Validate a node file straight from its raw bytes."""
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    try:
+        node = reference_repo_model.Node.model_validate_json(raw)
+    except ValidationError as e:
+        # only parse the file a second time to label the failure
+        try:
+            node_json = json.loads(raw)
+        except ValueError:
+            node_json = {}
+        return NodeValidation(
+            path=str(path),
+            site=site_from_path(path),
+            uid=node_json.get("uid"),
+            node_name=node_json.get("node_name"),
+            error=str(e),
+        )
+
+    return NodeValidation(
+        path=str(path),
+        site=site_from_path(path),
+        uid=str(node.uid),
+        node_name=node.node_name,
+        error=None,
+    )
+
+
+def summarize(results, elapsed) -> dict:
+    sites = {}
+    failures = []
+    counts = Counter()
+    for result in results:
+        site_counts = sites.setdefault(result.site, {"total": 0, "invalid": 0})
+        site_counts["total"] += 1
+        counts["total"] += 1
+        if result.error:
+            site_counts["invalid"] += 1
+            counts["invalid"] += 1
+            failures.append(result._asdict())
+
+    return {
+        "total": counts["total"],
+        "invalid": counts["invalid"],
+        "elapsed_seconds": round(elapsed, 3),
+        "sites": sites,
+        "failures": failures,
+    }
+
+
+def main():
+    args = parse_args()
+    if not args.profile:
+        sys.exit(run(args))
+
+    profiler = profiling.Profiler(args.profile)
+    try:
+        if args.profile_scope == "validation":
+            status = run(args, validate=profiler.wrap(validate_node_file))
+        else:
+            profiler.enable()
+            status = run(args, validate=validate_node_file)
+    finally:
+        profiler.disable()
+        profiler.report()
+    sys.exit(status)
+
+
+def validate_in_pool(node_files, processes):
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        yield from executor.map(validate_node_file, node_files, chunksize=16)
+
+
+def run(args, validate=None) -> int:
+    """Validate the node files; with a validate function, run it in-process.
+
+    Returns the exit status: 1 if any node file is invalid, otherwise 0.
+    """
+    start = time.perf_counter()
+
+    if args.changed_since:
+        node_files = find_changed_node_json(
+            args.reference_repo_dir, args.changed_since, args.sites
+        )
+    else:
+        node_files = find_node_json(args.reference_repo_dir, args.sites)
+
+    if validate is None:
+        validated = validate_in_pool(node_files, args.processes)
+    else:
+        validated = map(validate, node_files)
+
+    results = []
+    for result in validated:
+        results.append(result)
+        if result.error:
+            print(
+                f"Validation error for node {result.uid}:{result.node_name} "
+                f"{result.error}",
+                file=sys.stderr,
+            )
+
+    summary = summarize(results, time.perf_counter() - start)
+    if args.summary_file == "-":
+        json.dump(summary, sys.stdout, indent=2)
+    elif args.summary_file:
+        with open(args.summary_file, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    return 1 if summary["invalid"] else 0
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,49 @@
+import gzip
+import json
+import os
+
+import fixtures
+from oslotest import base
+
+from reference_transmogrifier import capture
+
+
+class TestCapture(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, "uc.jsonl.gz"
+        )
+        self.node = {"id": "node-a", "name": "nc01", "updated_at": "2024-01-01"}
+        self.host = {"hypervisor_hostname": "node-a", "node_name": "nc01"}
+
+    def _write(self):
+        writer = capture.CaptureWriter(
+            self.path, "CHI@UC", [self.node], {"node-a": self.host}
+        )
+        self.assertFalse(os.path.exists(self.path))
+        writer.put_introspection("node-a", b'{"cpus": 48,\n "name": "\\u00e9"}')
+        writer.close()
+
+    def test_roundtrip(self):
+        self._write()
+        archive = capture.CaptureArchive(self.path)
+
+        self.assertEqual("CHI@UC", archive.get_region_name())
+        self.assertEqual([self.node], archive.get_nodes())
+        self.assertEqual({"node-a": self.host}, archive.get_blazar_hosts())
+        self.assertEqual(
+            b'{"cpus": 48,\n "name": "\\u00e9"}',
+            archive.get_introspection("node-a")["data"],
+        )
+        self.assertIsNone(archive.get_introspection("node-b"))
+
+    def test_header_is_first_record(self):
+        self._write()
+        with gzip.open(self.path, "rt") as f:
+            header = json.loads(f.readline())
+            self.assertEqual(3, len(f.readlines()))
+
+        self.assertEqual("header", header["type"])
+        self.assertEqual(capture.ARCHIVE_FORMAT, header["format"])
+        self.assertEqual(["node-a"], header["nodes"])
@@ -0,0 +1,36 @@
+import os
+import stat
+from unittest import mock
+
+import fixtures
+from oslotest import base
+
+from reference_transmogrifier import fileutils
+
+
+class TestAtomicWrite(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(self.tmp_dir, "node.json")
+
+    def test_write(self):
+        fileutils.atomic_write(self.path, b"old")
+        fileutils.atomic_write(self.path, b"new", mode=0o644)
+
+        with open(self.path, "rb") as f:
+            self.assertEqual(b"new", f.read())
+        self.assertEqual(0o644, stat.S_IMODE(os.stat(self.path).st_mode))
+        self.assertEqual(["node.json"], os.listdir(self.tmp_dir))
+
+    def test_failed_write_leaves_no_temp_file(self):
+        fileutils.atomic_write(self.path, b"old")
+
+        with mock.patch.object(os, "replace", side_effect=OSError("disk full")):
+            self.assertRaises(
+                OSError, fileutils.atomic_write, self.path, b"new"
+            )
+
+        self.assertEqual(["node.json"], os.listdir(self.tmp_dir))
+        with open(self.path, "rb") as f:
+            self.assertEqual(b"old", f.read())
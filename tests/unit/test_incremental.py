@@ -0,0 +1,42 @@
+import os
+
+import fixtures
+from oslotest import base
+
+from reference_transmogrifier import incremental
+
+
+class TestIncrementalState(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.state_file = os.path.join(self.tmp_dir, "state.json")
+        self.output = os.path.join(self.tmp_dir, "node.json")
+        with open(self.output, "w") as f:
+            f.write("{}")
+
+    def test_unchanged_node_is_current(self):
+        state = incremental.IncrementalState(self.state_file)
+        input_hash = state.input_hash(b'{"cpus": 48}', {"node_name": "nc35"})
+        self.assertFalse(state.is_current("node", input_hash, self.output))
+
+        state.record("node", input_hash, self.output)
+        state.save()
+
+        state = incremental.IncrementalState(self.state_file)
+        self.assertEqual(
+            input_hash, state.input_hash(b'{"cpus": 48}', {"node_name": "nc35"})
+        )
+        self.assertTrue(state.is_current("node", input_hash, self.output))
+
+    def test_changed_input_or_output(self):
+        state = incremental.IncrementalState(self.state_file)
+        input_hash = state.input_hash(b'{"cpus": 48}', {"node_name": "nc35"})
+        state.record("node", input_hash, self.output)
+
+        new_hash = state.input_hash(b'{"cpus": 96}', {"node_name": "nc35"})
+        self.assertFalse(state.is_current("node", new_hash, self.output))
+
+        with open(self.output, "w") as f:
+            f.write('{"edited": true}')
+        self.assertFalse(state.is_current("node", input_hash, self.output))
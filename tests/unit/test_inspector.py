@@ -1,5 +1,8 @@
 import json
+import os
+from unittest import mock
 
+import fixtures
 from oslotest import base
 
 from reference_transmogrifier.models.inspector import (
@@ -157,6 +160,55 @@ class TestPciDevices(base.BaseTestCase):
         # neither are found
         self.assertRaises(KeyError, pci.PCI_MAP.lookup_product, "gggg", "gggg")
 
+    def test_index_is_lazy(self):
+        cache_dir = self.useFixture(fixtures.TempDir()).path
+        pci_map = pci.PciIdsMap(cache_dir=cache_dir)
+        self.assertIsNone(pci_map._index)
+
+        vendor_info = pci_map.lookup_vendor("10ee")
+        self.assertEqual("Xilinx Corporation", vendor_info.vendor_name)
+        self.assertIn("10de", pci_map.index)
+
+    def test_index_cache(self):
+        cache_dir = self.useFixture(fixtures.TempDir()).path
+
+        built = pci.PciIdsMap(cache_dir=cache_dir).index
+        cache_files = os.listdir(cache_dir)
+        self.assertEqual(1, len(cache_files))
+
+        with mock.patch.object(pci.PciIdsMap, "_build_index") as build_index:
+            cached = pci.PciIdsMap(cache_dir=cache_dir).index
+        build_index.assert_not_called()
+        self.assertEqual(built, cached)
+
+    def test_index_cache_keeps_other_installs_entries(self):
+        cache_dir = self.useFixture(fixtures.TempDir()).path
+        other_install = f"pci-ids-v{pci.INDEX_CACHE_FORMAT}-0123abcd.idx"
+        old_format = f"pci-ids-v{pci.INDEX_CACHE_FORMAT - 1}-0123abcd.idx"
+        for name in (other_install, old_format):
+            with open(os.path.join(cache_dir, name), "wb") as f:
+                f.write(b"")
+
+        pci.PciIdsMap(cache_dir=cache_dir).index
+
+        cache_files = os.listdir(cache_dir)
+        self.assertEqual(2, len(cache_files))
+        self.assertIn(other_install, cache_files)
+        self.assertNotIn(old_format, cache_files)
+
+    def test_lookups_are_memoized(self):
+        pci_map = pci.PciIdsMap(cache_dir=self.useFixture(fixtures.TempDir()).path)
+
+        first = pci_map.lookup_product("10de", "1e30")
+        self.assertIs(first, pci_map.lookup_product("10de", "1e30"))
+        self.assertIs(
+            pci_map.lookup_vendor("10de"), pci_map.lookup_vendor("10de")
+        )
+
+        # both lookups share a single parse of the vendor block
+        self.assertEqual(1, pci_map._read_vendor.cache_info().misses)
+        self.assertRaises(AttributeError, setattr, first, "device_name", "foo")
+
     def test_parse_pci_devices(self):
         nvidia_rtx_6000_data = {
             "vendor_id": "10de",
@@ -170,3 +222,38 @@ class TestPciDevices(base.BaseTestCase):
         assert device_model.vendor_name == "NVIDIA Corporation"
         assert device_model.product_name == "TU102GL [Quadro RTX 6000/8000]"
         print(device_model.model_dump_json(indent=2))
+
+    def test_device_index(self):
+        devices = [
+            pci.PciDevice(
+                vendor_id=vendor_id,
+                product_id=product_id,
+                revision="00",
+                bus=f"0000:0{i}:00.0",
+                **{"class": pci_class},
+            )
+            for i, (vendor_id, product_id, pci_class) in enumerate(
+                [
+                    ("10de", "1e30", "030000"),
+                    # processor class, which KnownPciClassEnum doesn't cover
+                    ("8086", "0000", "0b4000"),
+                    ("10ee", "903f", "028000"),
+                    ("10de", "20b0", "030200"),
+                ]
+            )
+        ]
+        index = pci.PciDeviceIndex(devices)
+
+        with mock.patch.object(pci, "PCI_MAP") as pci_map:
+            displays = index.match(
+                classes=[pci.KnownPciClassEnum.display_controller]
+            )
+            accelerators = index.match(
+                classes=[pci.KnownPciClassEnum.display_controller],
+                ids=[("10ee", "903f", "028000")],
+            )
+        pci_map.lookup_vendor.assert_not_called()
+
+        self.assertEqual([devices[0], devices[3]], displays)
+        self.assertEqual([devices[0], devices[2], devices[3]], accelerators)
+        self.assertIs(index, pci.PciDeviceIndex.of(index))
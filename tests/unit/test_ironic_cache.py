@@ -0,0 +1,85 @@
+from unittest import mock
+
+import fixtures
+from oslotest import base
+
+from reference_transmogrifier import ironic_cache, main
+
+
+class TestIronicDataCache(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ironic_cache.IronicDataCache(
+            self.useFixture(fixtures.TempDir()).path
+        )
+        self.node = {
+            "id": "03129bbe-330c-4591-bc17-96d7e15d3e74",
+            "name": "nc35",
+            "updated_at": "2024-01-01T00:00:00+00:00",
+        }
+
+    def test_roundtrip(self):
+        self.cache.put_region_name("CHI@UC")
+        self.cache.put_node(self.node)
+        self.cache.put_blazar_host(
+            {"hypervisor_hostname": self.node["id"], "node_name": "nc35"}
+        )
+        self.cache.put_introspection(
+            self.node["id"], b'{"cpus": 48}', "2023-01-01", self.node["updated_at"]
+        )
+
+        self.assertEqual("CHI@UC", self.cache.get_region_name())
+        self.assertEqual([self.node], self.cache.get_nodes())
+        self.assertIn(self.node["id"], self.cache.get_blazar_hosts())
+        self.assertEqual(
+            b'{"cpus": 48}', self.cache.get_introspection(self.node["id"])["data"]
+        )
+        self.assertIsNone(self.cache.get_introspection("missing"))
+
+    def test_fetch_uses_cache_for_unchanged_node(self):
+        conn = mock.Mock()
+        self.cache.put_introspection(
+            self.node["id"], b'{"cpus": 48}', "2023-01-01", self.node["updated_at"]
+        )
+
+        data = main.fetch_inspection_data(conn, self.node, cache=self.cache)
+
+        self.assertEqual(b'{"cpus": 48}', data)
+        conn.baremetal_introspection.get.assert_not_called()
+
+    def test_fetch_uses_cache_for_same_introspection(self):
+        conn = mock.Mock()
+        conn.baremetal_introspection.get_introspection.return_value.finished_at = (
+            "2023-01-01"
+        )
+        self.cache.put_introspection(
+            self.node["id"], b'{"cpus": 48}', "2023-01-01", "2022-01-01"
+        )
+
+        data = main.fetch_inspection_data(conn, self.node, cache=self.cache)
+
+        self.assertEqual(b'{"cpus": 48}', data)
+        conn.baremetal_introspection.get.assert_not_called()
+        self.assertEqual(
+            self.node["updated_at"],
+            self.cache.get_introspection(self.node["id"])["node_updated_at"],
+        )
+
+    def test_fetch_refreshes_stale_entry(self):
+        conn = mock.Mock()
+        conn.baremetal_introspection.get_introspection.return_value.finished_at = (
+            "2024-01-01"
+        )
+        conn.baremetal_introspection.get.return_value = mock.Mock(
+            status_code=200, content=b'{"cpus": 96}'
+        )
+        self.cache.put_introspection(
+            self.node["id"], b'{"cpus": 48}', "2023-01-01", "2022-01-01"
+        )
+
+        data = main.fetch_inspection_data(conn, self.node, cache=self.cache)
+
+        self.assertEqual(b'{"cpus": 96}', data)
+        self.assertEqual(
+            b'{"cpus": 96}', self.cache.get_introspection(self.node["id"])["data"]
+        )
@@ -0,0 +1,446 @@
+import json
+import os
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import fixtures
+from git import Repo
+from openstack import exceptions
+from oslotest import base
+
+from reference_transmogrifier import capture, ironic_cache, main, reference_api
+
+
+class NodeSampleTestCase(base.BaseTestCase):
+    """Loads the nc35 Blazar host and inspection samples."""
+
+    def setUp(self):
+        super().setUp()
+
+        with open("tests/unit/json_samples/blazar_nc35.json") as f:
+            self.blazar_host = json.load(f)
+        with open("tests/unit/json_samples/ironic_inspector_nc35.json", "rb") as f:
+            self.inspection_raw = f.read()
+
+    def _use_local_checkout(self):
+        """Patch out fetching the reference repo, using the directory as-is."""
+        return mock.patch.object(
+            main,
+            "update_reference_repo",
+            side_effect=lambda repo_dir, url, ref, paths: main.open_local_repo(
+                repo_dir, paths
+            ),
+        )
+
+
+class TestConvertInOrder(NodeSampleTestCase):
+    def _items(self):
+        yield "good", (self.inspection_raw, self.blazar_host)
+        yield "bad", (b"{}", self.blazar_host)
+        yield "good again", (self.inspection_raw, self.blazar_host)
+
+    def _check(self, results):
+        results = list(results)
+        self.assertEqual(["good", "bad", "good again"], [r[0] for r in results])
+
+        node, error, timings = results[0][1]
+        self.assertEqual("nc35", node.node_name)
+        self.assertIsNone(error)
+        self.assertEqual({"validate", "convert"}, set(timings))
+
+        node, error, timings = results[1][1]
+        self.assertIsNone(node)
+        self.assertIn("validation error", error)
+
+    def test_inline(self):
+        self._check(main.convert_in_order(None, self._items()))
+
+    def test_executor(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self._check(main.convert_in_order(executor, self._items(), window=2))
+
+    def test_process_pool(self):
+        with main.start_convert_pool(1) as executor:
+            self.assertIsNone(executor)
+
+        with main.start_convert_pool(2) as executor:
+            # workers are running before any conversion is submitted
+            self.assertEqual(2, len(executor._processes))
+            self._check(main.convert_in_order(executor, self._items(), window=2))
+
+
+class TestLoadInventory(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conn = mock.Mock()
+
+        self.nodes = {}
+        for name in ("nc01", "nc02", "nc03"):
+            node = mock.Mock(id=f"{name}-uuid", updated_at="2024-01-01")
+            node.name = name
+            self.nodes[name] = node
+        self.conn.baremetal.nodes.return_value = list(self.nodes.values())
+        self.conn.baremetal.get_node.side_effect = (
+            lambda name, fields: self.nodes[name]
+        )
+
+        hosts = []
+        for node in self.nodes.values():
+            host = mock.Mock(hypervisor_hostname=node.id)
+            host.to_dict.return_value = {
+                "hypervisor_hostname": node.id,
+                "properties": {"node_name": node.name},
+            }
+            hosts.append(host)
+        self.conn.reservation.hosts.return_value = hosts
+
+    def test_only_nodes(self):
+        nodes, hosts = main.load_inventory(self.conn, only_nodes=["nc03", "nc01"])
+
+        self.assertEqual(["nc03", "nc01"], [n["name"] for n in nodes])
+        self.assertEqual({"nc03-uuid", "nc01-uuid"}, set(hosts))
+        self.assertEqual("nc01", hosts["nc01-uuid"]["node_name"])
+        self.conn.baremetal.nodes.assert_not_called()
+
+    def test_except_nodes(self):
+        nodes, hosts = main.load_inventory(self.conn, except_nodes=["nc02"])
+
+        self.assertEqual(["nc01", "nc03"], [n["name"] for n in nodes])
+        self.assertEqual({"nc01-uuid", "nc03-uuid"}, set(hosts))
+        self.conn.baremetal.nodes.assert_called_once_with(fields=main.NODE_FIELDS)
+
+
+class TestReplay(NodeSampleTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.capture_dir = f"{tmp_dir}/capture"
+        self.repo_dir = f"{tmp_dir}/reference-repository"
+
+        self.node_id = self.blazar_host["hypervisor_hostname"]
+        self.metrics_file = f"{tmp_dir}/metrics.json"
+        self.cache = cache = ironic_cache.IronicDataCache(self.capture_dir)
+        cache.put_region_name("CHI@UC")
+        cache.put_node(
+            {"id": self.node_id, "name": "nc35", "updated_at": "2024-01-01"}
+        )
+        cache.put_blazar_host(self.blazar_host)
+        cache.put_introspection(self.node_id, self.inspection_raw, "2023-01-01", None)
+
+        self.archive_path = f"{tmp_dir}/uc.jsonl.gz"
+        writer = capture.CaptureWriter(
+            self.archive_path,
+            cache.get_region_name(),
+            cache.get_nodes(),
+            cache.get_blazar_hosts(),
+        )
+        writer.put_introspection(self.node_id, self.inspection_raw)
+        writer.close()
+
+    def _replay(self, *extra_args, replay_from=None):
+        argv = [
+            "generate-reference-repo",
+            "--replay",
+            replay_from or self.capture_dir,
+            "--reference-repo-dir",
+            self.repo_dir,
+            *extra_args,
+        ]
+        with mock.patch("sys.argv", argv), mock.patch.object(
+            main.openstack, "connect"
+        ) as connect:
+            main.main()
+        connect.assert_not_called()
+
+    def _node_counts(self):
+        with open(self.metrics_file) as f:
+            return json.load(f)["nodes"]
+
+    def test_replay_into_new_repo(self):
+        self._replay()
+
+        node_json = reference_api.get_node_data_path(self.repo_dir, "uc", self.node_id)
+        with open(node_json) as f:
+            self.assertEqual("nc35", json.load(f)["node_name"])
+        self.assertFalse(Repo(self.repo_dir).head.is_valid())
+
+    def test_replay_from_archive(self):
+        self._replay(replay_from=self.archive_path)
+
+        node_json = reference_api.get_node_data_path(self.repo_dir, "uc", self.node_id)
+        self.assertTrue(node_json.exists())
+
+    def test_replay_invalid_json_verbose(self):
+        self.cache.put_introspection(self.node_id, b"not json", "2023-01-01", None)
+
+        self._replay("--verbose", "--metrics-file", self.metrics_file)
+
+        self.assertEqual(1, self._node_counts()["failed"])
+
+    def test_replay_missing_blazar_host(self):
+        os.unlink(f"{self.capture_dir}/blazar_hosts/{self.node_id}.json")
+
+        self._replay("--metrics-file", self.metrics_file)
+
+        self.assertEqual(1, self._node_counts()["failed"])
+
+    def test_replay_site_override(self):
+        self._replay("--site", "tacc")
+
+        node_json = reference_api.get_node_data_path(
+            self.repo_dir, "tacc", self.node_id
+        )
+        self.assertTrue(node_json.exists())
+
+
+class TestMultiSite(NodeSampleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = self.useFixture(fixtures.TempDir()).path
+
+    def _site(self, cloud_name, node_id):
+        blazar_host = dict(self.blazar_host, hypervisor_hostname=node_id)
+        return main.SiteInputs(
+            cloud_name=cloud_name,
+            region_name=cloud_name,
+            nodes=[{"id": node_id, "name": "nc35", "updated_at": None}],
+            blazar_hosts={node_id: blazar_host},
+            fetch=lambda node: self.inspection_raw,
+        )
+
+    def test_interleave(self):
+        self.assertEqual(
+            [1, "a", 2, "b", 3], list(main.interleave([1, 2, 3], ["a", "b"]))
+        )
+
+    def test_sites_share_one_checkout(self):
+        uc_id = "00000000-0000-4000-8000-000000000001"
+        tacc_id = "00000000-0000-4000-8000-000000000002"
+        sites = {"uc": self._site("uc", uc_id), "tacc": self._site("tacc", tacc_id)}
+
+        argv = [
+            "generate-reference-repo",
+            "--cloud",
+            "uc",
+            "tacc",
+            "--reference-repo-dir",
+            self.repo_dir,
+        ]
+        with mock.patch("sys.argv", argv), mock.patch.object(
+            main, "load_site", side_effect=lambda args, cloud: sites[cloud]
+        ), self._use_local_checkout() as update:
+            main.main()
+
+        self.assertEqual(1, update.call_count)
+        self.assertEqual(
+            [
+                reference_api.get_node_data_dir("", "uc").as_posix(),
+                reference_api.get_node_data_dir("", "tacc").as_posix(),
+            ],
+            update.call_args.args[3],
+        )
+        for cloud_name, node_id in (("uc", uc_id), ("tacc", tacc_id)):
+            node_json = reference_api.get_node_data_path(
+                self.repo_dir, cloud_name, node_id
+            )
+            self.assertTrue(node_json.exists())
+
+    def _conn(self, region_name, node_id, node_name):
+        conn = mock.Mock()
+        conn.config.get_region_name.return_value = region_name
+        node = mock.Mock(id=node_id, updated_at=None)
+        node.name = node_name
+
+        def get_node(name_or_id, fields):
+            if name_or_id in (node_id, node_name):
+                return node
+            raise exceptions.NotFoundException()
+
+        conn.baremetal.get_node.side_effect = get_node
+        host = mock.Mock(hypervisor_hostname=node_id)
+        host.to_dict.return_value = dict(
+            self.blazar_host, hypervisor_hostname=node_id, properties={}
+        )
+        conn.reservation.hosts.return_value = [host]
+        conn.baremetal_introspection.get.return_value = mock.Mock(
+            status_code=200, content=self.inspection_raw
+        )
+        return conn
+
+    def _run_only_nodes(self, *only_nodes):
+        conns = {
+            "uc": self._conn("CHI@UC", "00000000-0000-4000-8000-000000000001", "nc01"),
+            "tacc": self._conn(
+                "CHI@TACC", "00000000-0000-4000-8000-000000000002", "P3-CPU-001"
+            ),
+        }
+        argv = [
+            "generate-reference-repo",
+            "--cloud",
+            "uc",
+            "tacc",
+            "--reference-repo-dir",
+            self.repo_dir,
+            "--only-nodes",
+            *only_nodes,
+        ]
+        with mock.patch("sys.argv", argv), mock.patch.object(
+            main.openstack, "connect", side_effect=lambda cloud: conns[cloud]
+        ), self._use_local_checkout():
+            main.main()
+
+    def test_only_nodes_at_one_site(self):
+        self._run_only_nodes("nc01")
+
+        node_json = reference_api.get_node_data_path(
+            self.repo_dir, "uc", "00000000-0000-4000-8000-000000000001"
+        )
+        self.assertTrue(node_json.exists())
+        self.assertFalse(
+            reference_api.get_node_data_dir(self.repo_dir, "tacc").joinpath(
+                "00000000-0000-4000-8000-000000000002.json"
+            ).exists()
+        )
+
+    def test_only_nodes_at_no_site(self):
+        self.assertRaises(SystemExit, self._run_only_nodes, "nc01", "nc99")
+
+
+class TestConcurrentFetch(NodeSampleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = self.useFixture(fixtures.TempDir()).path
+
+    def test_workers_must_be_positive(self):
+        for value in ("0", "-1", "two"):
+            argv = ["generate-reference-repo", "--workers", value]
+            with mock.patch("sys.argv", argv), mock.patch("sys.stderr"):
+                self.assertRaises(SystemExit, main.parse_args)
+
+    def test_output_order_with_out_of_order_fetches(self):
+        node_ids = [f"00000000-0000-4000-8000-00000000000{i}" for i in range(1, 6)]
+        missing_id = node_ids[2]
+
+        def fetch(node):
+            # later nodes finish first
+            time.sleep(0.01 * (len(node_ids) - node_ids.index(node["id"])))
+            if node["id"] == missing_id:
+                return None
+            return self.inspection_raw
+
+        site = main.SiteInputs(
+            cloud_name="uc",
+            region_name="CHI@UC",
+            nodes=[
+                {"id": node_id, "name": f"nc0{i}", "updated_at": None}
+                for i, node_id in enumerate(node_ids)
+            ],
+            blazar_hosts={
+                node_id: dict(self.blazar_host, hypervisor_hostname=node_id)
+                for node_id in node_ids
+            },
+            fetch=fetch,
+        )
+        metrics_file = f"{self.repo_dir}.metrics.json"
+        self.addCleanup(os.unlink, metrics_file)
+
+        argv = [
+            "generate-reference-repo",
+            "--workers",
+            "4",
+            "--reference-repo-dir",
+            self.repo_dir,
+            "--metrics-file",
+            metrics_file,
+        ]
+        with mock.patch("sys.argv", argv), mock.patch.object(
+            main, "load_site", return_value=site
+        ), self._use_local_checkout(), mock.patch.object(main, "print", create=True) as print_:
+            main.main()
+
+        node_lines = [
+            c.args[0].split(":")[0]
+            for c in print_.call_args_list
+            if c.args[0].split(":")[0] in node_ids
+        ]
+        self.assertEqual(node_ids, node_lines)
+        self.assertIn(
+            mock.call(f"{missing_id}:nc02: missing inspection data - skipping"),
+            print_.call_args_list,
+        )
+        with open(metrics_file) as f:
+            counts = json.load(f)["nodes"]
+        self.assertEqual(1, counts["missing"])
+        self.assertEqual(4, counts["added"])
+
+
+class TestReferenceRepoCheckout(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self.checkout_dir = f"{tmp_dir}/checkout"
+        self.nodes_dir = reference_api.get_node_data_dir("", "uc").as_posix()
+
+        self.upstream = Repo.init(f"{tmp_dir}/upstream", initial_branch="master")
+        self.upstream.config_writer().set_value("user", "name", "test").release()
+        self.upstream.config_writer().set_value(
+            "user", "email", "test@example.com"
+        ).release()
+        self._commit({f"{self.nodes_dir}/a.json": "{}", "docs/README.md": "readme"})
+        self.url = f"file://{self.upstream.working_dir}"
+
+    def _commit(self, files):
+        for name, contents in files.items():
+            path = pathlib.Path(self.upstream.working_dir, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(contents)
+        self.upstream.index.add(list(files))
+        self.upstream.index.commit("update")
+
+    def test_sparse_clone(self):
+        repo = main.clone_reference_repo(
+            self.url, "master", self.checkout_dir, sparse_paths=[self.nodes_dir]
+        )
+
+        checkout = pathlib.Path(repo.working_dir)
+        self.assertTrue(checkout.joinpath(self.nodes_dir, "a.json").exists())
+        self.assertFalse(checkout.joinpath("docs/README.md").exists())
+        self.assertEqual(1, len(list(repo.iter_commits())))
+
+    def test_update_only_cleans_node_paths(self):
+        repo = main.clone_reference_repo(self.url, "master", self.checkout_dir)
+        checkout = pathlib.Path(repo.working_dir)
+        checkout.joinpath(self.nodes_dir, "a.json").write_text("local change")
+        checkout.joinpath(self.nodes_dir, "stale.json").write_text("{}")
+        checkout.joinpath("notes.txt").write_text("keep me")
+        self._commit({f"{self.nodes_dir}/b.json": "{}"})
+
+        repo = main.update_reference_repo(
+            self.checkout_dir, self.url, "master", [self.nodes_dir]
+        )
+
+        self.assertEqual(self.upstream.head.commit, repo.head.commit)
+        self.assertEqual("{}", checkout.joinpath(self.nodes_dir, "a.json").read_text())
+        self.assertTrue(checkout.joinpath(self.nodes_dir, "b.json").exists())
+        self.assertFalse(checkout.joinpath(self.nodes_dir, "stale.json").exists())
+        self.assertEqual("keep me", checkout.joinpath("notes.txt").read_text())
+
+    def test_update_keeps_full_clone(self):
+        repo = main.clone_reference_repo(self.url, "master", self.checkout_dir)
+        self._commit({f"{self.nodes_dir}/b.json": "{}"})
+        other = self.upstream.create_head("other")
+        other.checkout()
+        self._commit({f"{self.nodes_dir}/c.json": "{}"})
+
+        # origin is unreachable, so this only works by fetching from the URL
+        repo.git.remote("set-url", "origin", "file:///nonexistent")
+        repo = main.update_reference_repo(
+            self.checkout_dir, self.url, "other", [self.nodes_dir]
+        )
+
+        checkout = pathlib.Path(repo.working_dir)
+        self.assertEqual(self.upstream.head.commit, repo.head.commit)
+        self.assertTrue(checkout.joinpath("docs/README.md").exists())
+        self.assertEqual(3, len(list(repo.iter_commits())))
@@ -0,0 +1,65 @@
+import json
+import os
+from collections import Counter
+
+import fixtures
+from oslotest import base
+
+from reference_transmogrifier import metrics
+
+
+class TestRunMetrics(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+
+        self.run_metrics = metrics.RunMetrics()
+        self.run_metrics.record("fetch", 0.5, "node-a")
+        self.run_metrics.record("fetch", 0.25, "node-b")
+        with self.run_metrics.timer("diff"):
+            pass
+        self.run_metrics.count_site("uc", Counter(modified=2))
+        self.run_metrics.count_site("tacc", Counter(modified=1, failed=1))
+
+    def test_json(self):
+        path = os.path.join(self.tmp_dir, "metrics.json")
+        self.run_metrics.write(path)
+
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(
+            {
+                "added": 0,
+                "modified": 3,
+                "unchanged": 0,
+                "skipped": 0,
+                "failed": 1,
+                "missing": 0,
+            },
+            data["nodes"],
+        )
+        self.assertEqual(2, data["sites"]["uc"]["modified"])
+        self.assertEqual(0, data["sites"]["uc"]["failed"])
+        self.assertEqual(0.75, data["stage_seconds"]["fetch"])
+        self.assertIn("diff", data["stage_seconds"])
+        self.assertEqual({"fetch": 0.5}, data["node_timings"]["node-a"])
+
+    def test_prometheus(self):
+        path = os.path.join(self.tmp_dir, "metrics.prom")
+        self.run_metrics.write(path)
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertIn(
+            'reference_transmogrifier_nodes{site="uc",result="modified"} 2', lines
+        )
+        self.assertIn(
+            'reference_transmogrifier_nodes{site="uc",result="failed"} 0', lines
+        )
+        self.assertIn(
+            'reference_transmogrifier_nodes{site="tacc",result="failed"} 1', lines
+        )
+        self.assertIn(
+            'reference_transmogrifier_stage_seconds{stage="fetch"} 0.750000', lines
+        )
+        self.assertFalse([line for line in lines if "node-a" in line])
@@ -1,8 +1,17 @@
+import copy
 import json
+import os
 
+import fixtures
+import pydantic
 from oslotest import base
 
-from reference_transmogrifier.models import blazar, inspector, reference_repo
+from reference_transmogrifier.models import (
+    blazar,
+    inspector,
+    reference_repo,
+    vocabulary,
+)
 
 
 class ReferenceRepoNode(base.BaseTestCase):
@@ -84,6 +93,34 @@ class ReferenceRepoNode(base.BaseTestCase):
             inspection_model.inventory.disks, inspection_model.extra.disk
         )
 
+    def test_find_storage_devices_by_serial(self):
+        inspection_model = inspector.InspectorResult.model_validate(
+            self.ironic_inspector_node_json
+        )
+        inventory_disks = inspection_model.inventory.disks
+        extra_disks = inspection_model.extra.disk
+        without_wwn = [d.model_copy(update={"wwn_id": None}) for d in extra_disks]
+
+        self.assertEqual(
+            reference_repo.Node.find_storage_devices(inventory_disks, extra_disks),
+            reference_repo.Node.find_storage_devices(inventory_disks, without_wwn),
+        )
+
+    def test_find_storage_devices_duplicate_wwn(self):
+        inspection_model = inspector.InspectorResult.model_validate(
+            self.ironic_inspector_node_json
+        )
+        inventory_disks = inspection_model.inventory.disks
+        extra_disks = inspection_model.extra.disk
+
+        self.assertRaisesRegex(
+            ValueError,
+            "duplicate WWN",
+            reference_repo.Node.find_storage_devices,
+            [inventory_disks[0], inventory_disks[0]],
+            [extra_disks[0], extra_disks[0]],
+        )
+
     def test_generate_data(self):
         blazar_info = blazar.Host(
             hypervisor_hostname="03129bbe-330c-4591-bc17-96d7e15d3e74",
@@ -102,3 +139,63 @@ class ReferenceRepoNode(base.BaseTestCase):
         )
 
         print(output_node_model.model_dump_json(indent=2))
+
+    def test_conversion_view_matches_full_result(self):
+        blazar_info = blazar.Host(**self.blazar_host_json)
+
+        full_model = inspector.InspectorResult.model_validate(
+            copy.deepcopy(self.ironic_inspector_node_json)
+        )
+        conversion_model = inspector.ConversionInspectorResult.model_validate(
+            copy.deepcopy(self.ironic_inspector_node_json)
+        )
+        self.assertNotIn("configuration", conversion_model.model_fields_set)
+
+        self.assertEqual(
+            reference_repo.Node.from_inspector_result(
+                blazar_info, full_model
+            ).model_dump_json(),
+            reference_repo.Node.from_inspector_result(
+                blazar_info, conversion_model
+            ).model_dump_json(),
+        )
+
+
+class TestVocabulary(base.BaseTestCase):
+    def test_normalize_manufacturer(self):
+        self.assertEqual(
+            reference_repo.ManufacturerEnum.intel,
+            reference_repo.normalize_manufacturer(" GenuineIntel "),
+        )
+        self.assertEqual(
+            reference_repo.ManufacturerEnum.amd,
+            reference_repo.normalize_manufacturer(
+                "Advanced Micro Devices, Inc. [AMD/ATI]"
+            ),
+        )
+        self.assertRaises(
+            ValueError, reference_repo.normalize_manufacturer, "Advanced Micro"
+        )
+
+    def test_vocabulary_tables(self):
+        chassis = reference_repo.Chassis(name="FX700 (SKU=0)")
+        self.assertEqual(reference_repo.ChassisModelEnum.dell_fx700, chassis.name)
+        self.assertRaises(
+            pydantic.ValidationError, reference_repo.Chassis, name="PowerEdge R1"
+        )
+        self.assertEqual(
+            reference_repo.StorageMediaTypeEnum.rotational,
+            reference_repo.STORAGE_MEDIA_TYPES["HDD"],
+        )
+
+    def test_override_file(self):
+        override = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, "vocabulary.json"
+        )
+        with open(override, "w") as f:
+            json.dump({"manufacturers": {"aliases": {"hgst": "Seagate"}}}, f)
+
+        loaded = vocabulary.load_vocabulary(override)
+
+        self.assertEqual("Seagate", loaded["manufacturers"]["aliases"]["hgst"])
+        self.assertEqual("Intel", loaded["manufacturers"]["aliases"]["intel"])
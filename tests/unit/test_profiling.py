@@ -0,0 +1,51 @@
+import os
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+import fixtures
+from oslotest import base
+
+from reference_transmogrifier import profiling
+
+
+def busy(n):
+    return sum(range(n))
+
+
+class TestProfiler(base.BaseTestCase):
+    def test_wrap_only_profiles_wrapped_calls(self):
+        stats_file = os.path.join(self.useFixture(fixtures.TempDir()).path, "p.pstats")
+        profiler = profiling.Profiler(stats_file)
+
+        self.assertEqual(45, profiler.wrap(busy)(10))
+        busy(10)
+        profiler.report()
+
+        stats = pstats.Stats(stats_file)
+        calls = {func[2]: stat[1] for func, stat in stats.stats.items()}
+        self.assertEqual(1, calls["busy"])
+        self.assertIn("busy", profiler.summary())
+
+    def test_report_without_calls(self):
+        stats_file = os.path.join(self.useFixture(fixtures.TempDir()).path, "p.pstats")
+        profiler = profiling.Profiler(stats_file)
+
+        profiler.wrap(busy)
+        profiler.report()
+
+        self.assertFalse(os.path.exists(stats_file))
+        self.assertEqual("no calls were profiled", profiler.summary())
+
+    def test_enable_profiles_threads(self):
+        stats_file = os.path.join(self.useFixture(fixtures.TempDir()).path, "p.pstats")
+        profiler = profiling.Profiler(stats_file)
+
+        profiler.enable()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual([45, 45], list(executor.map(busy, [10, 10])))
+        profiler.disable()
+        profiler.report()
+
+        stats = pstats.Stats(stats_file)
+        calls = {func[2]: stat[1] for func, stat in stats.stats.items()}
+        self.assertEqual(2, calls["busy"])
@@ -0,0 +1,73 @@
+import json
+import os
+
+import fixtures
+from git import Repo
+from oslotest import base
+
+from reference_transmogrifier import reference_api
+from reference_transmogrifier.models import reference_repo
+
+
+class TestWriteReferenceRepo(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = self.useFixture(fixtures.TempDir()).path
+        reference_api.get_node_data_dir(self.repo_dir, "uc").mkdir(parents=True)
+
+        with open("tests/unit/json_samples/r_api_nc35.json") as f:
+            self.node = reference_repo.Node.model_validate(json.load(f))
+
+    def test_write_if_changed(self):
+        first = reference_api.write_reference_repo(self.repo_dir, "uc", self.node)
+        self.assertTrue(first.changed)
+        self.assertEqual(
+            reference_api.get_node_data_path(self.repo_dir, "uc", self.node.uid),
+            first.path,
+        )
+
+        os.utime(first.path, (0, 0))
+        second = reference_api.write_reference_repo(self.repo_dir, "uc", self.node)
+        self.assertFalse(second.changed)
+        self.assertEqual(0, os.stat(second.path).st_mtime)
+
+        self.node.node_name = "renamed"
+        third = reference_api.write_reference_repo(self.repo_dir, "uc", self.node)
+        self.assertTrue(third.changed)
+        self.assertIn('"renamed"', third.path.read_text())
+        self.assertEqual(["%s.json" % self.node.uid], os.listdir(first.path.parent))
+
+
+class TestDiffReferenceRepo(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = self.useFixture(fixtures.TempDir()).path
+        self.repo = Repo.init(self.repo_dir)
+
+        self.nodes_dir = reference_api.get_node_data_dir(self.repo_dir, "uc")
+        self.nodes_dir.mkdir(parents=True)
+        for name in ("modified", "unchanged", "deleted"):
+            self.nodes_dir.joinpath(f"{name}.json").write_text("{}")
+        self.repo.index.add([str(p) for p in self.nodes_dir.iterdir()])
+        self.repo.index.commit("initial node data")
+
+    def test_diff(self):
+        self.nodes_dir.joinpath("modified.json").write_text('{"uid": 1}')
+        self.nodes_dir.joinpath("unchanged.json").write_text("{}")
+        self.nodes_dir.joinpath("deleted.json").unlink()
+        self.nodes_dir.joinpath("added.json").write_text("{}")
+
+        changes = reference_api.diff_reference_repo(self.repo, "uc")
+
+        self.assertEqual([self.nodes_dir.joinpath("added.json")], changes.added)
+        self.assertEqual([self.nodes_dir.joinpath("modified.json")], changes.modified)
+        self.assertEqual([self.nodes_dir.joinpath("deleted.json")], changes.deleted)
+
+    def test_other_sites_are_ignored(self):
+        other_dir = reference_api.get_node_data_dir(self.repo_dir, "tacc")
+        other_dir.mkdir(parents=True)
+        other_dir.joinpath("added.json").write_text("{}")
+
+        changes = reference_api.diff_reference_repo(self.repo, "uc")
+
+        self.assertEqual([], changes.added + changes.modified + changes.deleted)
@@ -0,0 +1,118 @@
+import io
+import json
+from unittest import mock
+
+import fixtures
+from git import Repo
+from oslotest import base
+
+from reference_transmogrifier import reference_api, validate
+
+
+class TestValidate(base.BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo_dir = self.useFixture(fixtures.TempDir()).path
+
+        with open("tests/unit/json_samples/r_api_nc35.json") as f:
+            self.reference_node_json = json.load(f)
+
+        self.good_path = self._write_node("uc", self.reference_node_json)
+        bad_node_json = dict(self.reference_node_json, node_type="not_a_node_type")
+        self.bad_path = self._write_node("tacc", bad_node_json)
+
+    def _write_node(self, site, node_json):
+        nodes_dir = reference_api.get_node_data_dir(self.repo_dir, site)
+        nodes_dir.mkdir(parents=True, exist_ok=True)
+        path = nodes_dir.joinpath(f"{node_json['uid']}.json")
+        path.write_text(json.dumps(node_json))
+        return path
+
+    def test_validate_node_file(self):
+        result = validate.validate_node_file(self.good_path)
+        self.assertIsNone(result.error)
+        self.assertEqual("uc", result.site)
+        self.assertEqual(self.reference_node_json["uid"], result.uid)
+
+        result = validate.validate_node_file(self.bad_path)
+        self.assertIn("node_type", result.error)
+        self.assertEqual("tacc", result.site)
+        self.assertEqual(self.reference_node_json["node_name"], result.node_name)
+
+    def test_summarize(self):
+        results = [
+            validate.validate_node_file(p) for p in (self.good_path, self.bad_path)
+        ]
+        summary = validate.summarize(results, 1.0)
+
+        self.assertEqual(2, summary["total"])
+        self.assertEqual(1, summary["invalid"])
+        self.assertEqual({"total": 1, "invalid": 0}, summary["sites"]["uc"])
+        self.assertEqual({"total": 1, "invalid": 1}, summary["sites"]["tacc"])
+        self.assertEqual(
+            [str(self.bad_path)], [f["path"] for f in summary["failures"]]
+        )
+
+    def test_find_node_json(self):
+        self.assertEqual(
+            sorted([str(self.good_path), str(self.bad_path)]),
+            validate.find_node_json(self.repo_dir),
+        )
+
+    def test_find_node_json_sites(self):
+        self.assertEqual(
+            [str(self.good_path)], validate.find_node_json(self.repo_dir, ["uc"])
+        )
+        self.assertEqual([], validate.find_node_json(self.repo_dir, ["nrp"]))
+
+    def test_find_changed_node_json(self):
+        repo = Repo.init(self.repo_dir)
+        repo.index.add([str(self.good_path), str(self.bad_path)])
+        repo.index.commit("initial node data")
+
+        self.assertEqual(
+            [], validate.find_changed_node_json(self.repo_dir, "HEAD")
+        )
+
+        self.good_path.write_text(json.dumps(self.reference_node_json, indent=2))
+        self.assertEqual(
+            [str(self.good_path)],
+            validate.find_changed_node_json(self.repo_dir, "HEAD"),
+        )
+        self.assertEqual(
+            [], validate.find_changed_node_json(self.repo_dir, "HEAD", ["tacc"])
+        )
+
+    def test_find_changed_node_json_untracked(self):
+        repo = Repo.init(self.repo_dir)
+        repo.index.add([str(self.good_path)])
+        repo.index.commit("initial node data")
+
+        self.assertEqual(
+            [str(self.bad_path)],
+            validate.find_changed_node_json(self.repo_dir, "HEAD"),
+        )
+
+    def test_exit_status(self):
+        def validate_run(*argv):
+            with mock.patch("sys.argv", ["validate", self.repo_dir, *argv]):
+                args = validate.parse_args()
+            return validate.run(args, validate=validate.validate_node_file)
+
+        self.assertEqual(1, validate_run())
+        self.assertEqual(0, validate_run("--sites", "uc"))
+
+    def test_summary_on_stdout(self):
+        with mock.patch("sys.argv", ["validate", self.repo_dir, "--summary-file", "-"]):
+            args = validate.parse_args()
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            with mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+                validate.run(args, validate=validate.validate_node_file)
+
+        self.assertEqual(1, json.loads(stdout.getvalue())["invalid"])
+        self.assertIn("Validation error for node", stderr.getvalue())
+
+    def test_processes_must_be_positive(self):
+        with mock.patch("sys.argv", ["validate", self.repo_dir, "--processes", "0"]):
+            with mock.patch("sys.stderr", new_callable=io.StringIO):
+                self.assertRaises(SystemExit, validate.parse_args)